@@ -1,17 +1,10 @@
 #!/bin/sh
 
-# Wait for the database to be ready
-echo "Waiting for database..."
-python src/wait_for_db.py
+# Wait for the database, apply migrations and seed it
+# (migrate and seed_db are skipped when already up to date)
+echo "Preparing database..."
+python src/manage.py prepare_db
 
-# Apply database migrations
-echo "Apply database migrations"
-python src/manage.py migrate
-
-# Seed the database
-echo "Seeding database..."
-python src/manage.py seed_db
-
-# Start server
+# Start server (no autoreloader: the code is baked into the image)
 echo "Starting server"
-python src/manage.py runserver 0.0.0.0:8000
+exec python src/manage.py runserver 0.0.0.0:8000 --noreload
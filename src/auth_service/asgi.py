@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_service.settings')
 
 application = get_asgi_application()
+
+# Журнал аудита пишется фоновым потоком только в серверном процессе
+from core.audit import audit  # noqa: E402
+
+audit.start()
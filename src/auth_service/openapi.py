@@ -0,0 +1,7 @@
+from drf_yasg import openapi
+
+api_info = openapi.Info(
+   title="Auth Service API",
+   default_version='v1',
+   description="API for authentication and authorization",
+)
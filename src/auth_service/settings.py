@@ -31,6 +31,12 @@ DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
 ALLOWED_HOSTS = []
 
+# Профиль развертывания: 'full' (по умолчанию) или 'api'.
+# Профиль 'api' — чистый JWT API без админки, сессий, сообщений и CSRF:
+# лишние middleware не выполняются на каждом запросе.
+DEPLOYMENT_PROFILE = os.getenv('DJANGO_PROFILE', 'full')
+API_ONLY = DEPLOYMENT_PROFILE == 'api'
+
 
 # Application definition
 
@@ -45,10 +51,12 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
-    'drf_yasg',
+    # drf_yasg не подключается как приложение: схема собирается командой
+    # build_openapi_schema, а на старте процесса drf_yasg не импортируется
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +66,28 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if API_ONLY:
+    INSTALLED_APPS = [
+        app for app in INSTALLED_APPS
+        if app not in (
+            'django.contrib.admin',
+            'django.contrib.sessions',
+            'django.contrib.messages',
+            'django.contrib.staticfiles',
+        )
+    ]
+    # AuthenticationMiddleware требует сессий; DRF аутентифицирует по JWT сам
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if middleware not in (
+            'django.contrib.sessions.middleware.SessionMiddleware',
+            'django.middleware.csrf.CsrfViewMiddleware',
+            'django.contrib.auth.middleware.AuthenticationMiddleware',
+            'django.contrib.messages.middleware.MessageMiddleware',
+            'django.middleware.clickjacking.XFrameOptionsMiddleware',
+        )
+    ]
+
 ROOT_URLCONF = 'auth_service.urls'
 
 TEMPLATES = [
@@ -69,8 +99,7 @@ TEMPLATES = [
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
+            ] + ([] if API_ONLY else ['django.contrib.messages.context_processors.messages']),
         },
     },
 ]
@@ -89,9 +118,55 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('POSTGRES_HOST'),
         'PORT': os.getenv('POSTGRES_PORT'),
+        # Недоступная БД не должна подвешивать старт и пробы готовности
+        'OPTIONS': {'connect_timeout': int(os.getenv('POSTGRES_CONNECT_TIMEOUT', 5))},
     }
 }
 
+# Ожидание БД при старте и пробы /healthz, /readyz
+HEALTH_CHECKS = {
+    # Сколько секунд ждать БД при старте контейнера (prepare_db, wait_for_db)
+    'DB_WAIT_TIMEOUT': float(os.getenv('DB_WAIT_TIMEOUT', 60)),
+    # Потолок экспоненциальной паузы между попытками подключения, секунд
+    'DB_WAIT_MAX_DELAY': float(os.getenv('DB_WAIT_MAX_DELAY', 5)),
+    # Сколько секунд процесс переиспользует результат проверки /readyz
+    'CACHE_TTL': float(os.getenv('HEALTH_CACHE_TTL', 2)),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Кэш используется для микрокэширования интроспекции токенов и версий RBAC.
+# В продакшене с несколькими воркерами нужен общий кэш (Redis), иначе
+# инвалидация будет видна только внутри одного процесса.
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/6.0/topics/auth/passwords/
+# Тот же pbkdf2_sha256, что и по умолчанию, но с замером времени хэширования
+
+PASSWORD_HASHERS = [
+    'core.hashers.InstrumentedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -129,14 +204,49 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Схема OpenAPI собирается при сборке образа и отдается из памяти процесса:
+# python src/manage.py build_openapi_schema
+OPENAPI_SCHEMA_FILE = os.getenv('OPENAPI_SCHEMA_FILE', str(BASE_DIR / 'openapi.json'))
+# Сколько секунд клиенты и прокси могут не перепроверять схему (затем — по ETag)
+OPENAPI_SCHEMA_MAX_AGE = int(os.getenv('OPENAPI_SCHEMA_MAX_AGE', 86400))
+
+SWAGGER_SETTINGS = {
+    'DEFAULT_INFO': 'auth_service.openapi.api_info',
+}
+
 AUTH_USER_MODEL = 'core.CustomUser'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.InstrumentedJWTAuthentication',
     ),
+    # JSON через orjson, если он установлен (иначе — стандартные классы DRF)
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Лимиты для защиты от подбора паролей (см. core/throttling.py).
+    # `*_account` считаются по email из тела запроса, остальные — по IP.
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.getenv('THROTTLE_LOGIN', '30/min'),
+        'login_account': os.getenv('THROTTLE_LOGIN_ACCOUNT', '5/min'),
+        'register': os.getenv('THROTTLE_REGISTER', '10/hour'),
+        'register_account': os.getenv('THROTTLE_REGISTER_ACCOUNT', '5/hour'),
+        'refresh': os.getenv('THROTTLE_REFRESH', '60/min'),
+    },
+    # Количество доверенных прокси перед сервисом (для определения IP клиента)
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES')) if os.getenv('NUM_PROXIES') else None,
 }
 
+if API_ONLY:
+    # Browsable API требует шаблонов и сессий; в профиле 'api' отдаем только JSON
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = ('core.renderers.FastJSONRenderer',)
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -151,6 +261,8 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    # Добавляет в токены claim арендатора (TENANCY['TOKEN_CLAIM'])
+    'TOKEN_OBTAIN_SERIALIZER': 'core.serializers.TenantTokenObtainPairSerializer',
     'TOKEN_TYPE_CLAIM': 'token_type',
     'JTI_CLAIM': 'jti',
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
@@ -158,4 +270,67 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Интроспекция токенов (RFC 7662) для API-шлюза
+TOKEN_INTROSPECTION = {
+    # Максимальное количество токенов в одном пакетном запросе
+    'MAX_BATCH_SIZE': 100,
+}
+
+# Многотенантность (core.models.Tenant)
+TENANCY = {
+    # Арендатор однотенантных установок и саморегистрации; создается миграцией
+    'DEFAULT_TENANT_ID': int(os.getenv('DEFAULT_TENANT_ID', 1)),
+    # Claim JWT с id арендатора пользователя
+    'TOKEN_CLAIM': 'tenant_id',
+}
+
+# Регистрация новых пользователей
+REGISTRATION = {
+    # Роль, назначаемая новому пользователю по умолчанию
+    'DEFAULT_ROLE': os.getenv('REGISTRATION_DEFAULT_ROLE', 'User'),
+    # Роль по домену email, например {'partner.example.com': 'Partner'}
+    'ROLES_BY_EMAIL_DOMAIN': {},
+}
+
+# Метрики Prometheus (эндпоинт /metrics)
+METRICS = {
+    # Общий каталог для снимков метрик воркеров (gunicorn/uwsgi с несколькими
+    # процессами). Без него /metrics показывает только метрики своего процесса.
+    'MULTIPROCESS_DIR': os.getenv('METRICS_MULTIPROC_DIR'),
+    # Как часто (в секундах) процесс сбрасывает снимок в MULTIPROCESS_DIR
+    'FLUSH_INTERVAL': 1.0,
+    # Если задан, /metrics требует заголовок "Authorization: Bearer <token>"
+    'TOKEN': os.getenv('METRICS_TOKEN'),
+}
+
+# Трассировка решений HasPermission (см. core/tracing.py, /api/admin/authz-traces/)
+AUTHZ_TRACING = {
+    'ENABLED': os.getenv('AUTHZ_TRACING', 'False') == 'True',
+    # Доля решений, попадающих в кольцевой буфер
+    'SAMPLE_RATE': float(os.getenv('AUTHZ_TRACING_SAMPLE_RATE', '0.01')),
+    'BUFFER_SIZE': 1000,
+    # Проверки дольше порога записываются всегда и профилируются через cProfile
+    'SLOW_THRESHOLD_MS': float(os.getenv('AUTHZ_TRACING_SLOW_MS', '50')),
+    'SLOW_BUFFER_SIZE': 100,
+    # Не чаще одного профилирования в N секунд на процесс
+    'PROFILE_INTERVAL': 10.0,
+}
+
+# Журнал аудита (core/audit.py): события пишутся пакетами в фоновом потоке
+AUDIT = {
+    'ENABLED': os.getenv('AUDIT_ENABLED', 'True') == 'True',
+    # 'database' — таблица AuditEvent (bulk_create), 'file' — NDJSON-файл
+    'SINK': os.getenv('AUDIT_SINK', 'database'),
+    'FILE': os.getenv('AUDIT_FILE', str(BASE_DIR / 'audit.ndjson')),
+    # Пакет пишется по достижении размера или по истечении интервала (секунд)
+    'BATCH_SIZE': int(os.getenv('AUDIT_BATCH_SIZE', 500)),
+    'FLUSH_INTERVAL': float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0)),
+    # Ограничение очереди; при переполнении запрос ждет не дольше PUT_TIMEOUT
+    # секунд, затем событие отбрасывается (метрика auth_audit_events_total)
+    'QUEUE_SIZE': int(os.getenv('AUDIT_QUEUE_SIZE', 10000)),
+    'PUT_TIMEOUT': 0.05,
+    # Сколько ждать фоновый поток при остановке перед синхронной дозаписью
+    'SHUTDOWN_TIMEOUT': 5.0,
+}
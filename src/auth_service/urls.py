@@ -1,22 +1,21 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Auth Service API",
-      default_version='v1',
-      description="API for authentication and authorization",
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
+from core.views import MetricsView, HealthView, ReadinessView, OpenAPISchemaView, ApiDocsView
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include('core.urls')),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-]
\ No newline at end of file
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('healthz', HealthView.as_view(), name='healthz'),
+    path('readyz', ReadinessView.as_view(), name='readyz'),
+    # Схема собирается при сборке образа (build_openapi_schema) и отдается из памяти
+    path('swagger.json', OpenAPISchemaView.as_view(), name='schema-json'),
+    path('swagger/', ApiDocsView.as_view(ui='swagger'), name='schema-swagger-ui'),
+    path('redoc/', ApiDocsView.as_view(ui='redoc'), name='schema-redoc'),
+]
+
+if not settings.API_ONLY:
+    from django.contrib import admin
+
+    urlpatterns += [
+        path('admin/', admin.site.urls),
+    ]
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Регистрируем обработчики сигналов инвалидации кэша
+        from . import signals  # noqa: F401
@@ -0,0 +1,256 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Кладется в очередь при остановке, чтобы разбудить ожидающий поток
+_STOP = object()
+
+
+class DatabaseSink:
+    """
+    Пишет пакет событий в таблицу `AuditEvent` одним `bulk_create`.
+    """
+    name = 'database'
+
+    def write(self, events):
+        from .models import AuditEvent
+
+        # Поток воркера живет дольше запроса: соединение проверяем так же, как
+        # между запросами (CONN_MAX_AGE, разорванное соединение после сбоя БД)
+        close_old_connections()
+        try:
+            AuditEvent.objects.bulk_create([AuditEvent(**event) for event in events])
+        except Exception:
+            connection.close()
+            raise
+
+
+class FileSink:
+    """
+    Дописывает пакет событий в NDJSON-файл (по объекту JSON на строку)
+    одной операцией записи с fsync: после сбоя в файле остаются только
+    целые пакеты, и его можно отдавать внешнему сборщику логов.
+    """
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, events):
+        data = b''.join(
+            json.dumps(event, cls=DjangoJSONEncoder, separators=(',', ':')).encode() + b'\n' for event in events
+        )
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def get_sink(config):
+    if config['SINK'] == 'file':
+        return FileSink(config['FILE'])
+    return DatabaseSink()
+
+
+class AuditLog:
+    """
+    Асинхронный журнал аудита: входы, выходы, обновления токенов, изменения
+    ролей и отказы `HasPermission`.
+
+    `record()` лишь кладет событие в очередь процесса (единицы микросекунд),
+    а фоновый поток пишет события пакетами — по `BATCH_SIZE` штук или раз в
+    `FLUSH_INTERVAL` секунд, что наступит раньше. Очередь ограничена
+    `QUEUE_SIZE`: если запись не успевает, запрос ждет место в очереди не
+    дольше `PUT_TIMEOUT` секунд (обратное давление), после чего событие
+    отбрасывается и учитывается в метрике. При завершении процесса очередь
+    дописывается синхронно.
+
+    Журнал включают серверные точки входа (`wsgi.py`, `asgi.py`) вызовом
+    `start()`; в остальных процессах (команды, тесты) `record()` ничего не делает.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = False
+        self._background = True
+        self._reset()
+
+    def _reset(self):
+        self._queue = None
+        self._worker = None
+        self._stopping = threading.Event()
+        self._pid = None
+
+    def start(self, background=True):
+        """
+        Включает журнал в текущем процессе. С `background=False` события
+        копятся в очереди до явного `flush()` (тесты).
+        """
+        if not settings.AUDIT['ENABLED']:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._background = background
+            self._sink = get_sink(settings.AUDIT)
+        atexit.register(self.stop)
+        if background:
+            self._install_sigterm_handler()
+
+    def record(self, event, request=None, user_id=None, **details):
+        """
+        Ставит событие в очередь. `user_id` по умолчанию — id `request.user`.
+        """
+        if not self._started:
+            return
+        if user_id is None and request is not None:
+            user = getattr(request, 'user', None)
+            user_id = user.pk if user is not None and user.is_authenticated else None
+        entry = {
+            'created_at': timezone.now(),
+            'event': event,
+            'user_id': user_id,
+            # Как у ограничителей частоты: адрес из X-Forwarded-For с учетом NUM_PROXIES
+            'ip': (BaseThrottle().get_ident(request) or '')[:64] if request is not None else '',
+            'details': details,
+        }
+        events = self._get_queue()
+        try:
+            events.put_nowait(entry)
+        except queue.Full:
+            try:
+                events.put(entry, timeout=settings.AUDIT['PUT_TIMEOUT'])
+            except queue.Full:
+                metrics.inc('auth_audit_events_total', event=event, result='dropped')
+                logger.warning('Audit queue is full, dropping %s event', event)
+                return
+        metrics.inc('auth_audit_events_total', event=event, result='queued')
+
+    def flush(self):
+        """
+        Синхронно записывает все события из очереди. Возвращает их количество.
+        """
+        events = self._queue
+        if events is None:
+            return 0
+        written = 0
+        while True:
+            batch = []
+            while len(batch) < settings.AUDIT['BATCH_SIZE']:
+                try:
+                    event = events.get_nowait()
+                except queue.Empty:
+                    break
+                if event is not _STOP:
+                    batch.append(event)
+            if not batch:
+                return written
+            self._write(batch)
+            written += len(batch)
+
+    def stop(self):
+        """
+        Останавливает фоновый поток (не дольше `SHUTDOWN_TIMEOUT` секунд)
+        и дописывает остаток очереди.
+        """
+        with self._lock:
+            worker = self._worker if self._pid == os.getpid() else None
+            self._stopping.set()
+        if worker is not None:
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                # Поток и так занят записью и проверит флаг остановки после нее
+                pass
+            worker.join(settings.AUDIT['SHUTDOWN_TIMEOUT'])
+        if self._pid == os.getpid():
+            self.flush()
+        with self._lock:
+            self._started = False
+            self._reset()
+
+    def _get_queue(self):
+        # Очередь и поток — на процесс: после fork (gunicorn --preload)
+        # дочерний процесс создает свои при первом событии
+        if self._pid == os.getpid():
+            return self._queue
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=settings.AUDIT['QUEUE_SIZE'])
+                self._stopping = threading.Event()
+                self._worker = None
+                if self._background:
+                    self._worker = threading.Thread(target=self._run, name='audit-log', daemon=True)
+                    self._worker.start()
+                self._pid = os.getpid()
+            return self._queue
+
+    def _run(self):
+        events, stopping = self._queue, self._stopping
+        config = settings.AUDIT
+        while not stopping.is_set():
+            # Ждем первое событие, затем добираем пакет до размера или до истечения интервала
+            try:
+                event = events.get(timeout=config['FLUSH_INTERVAL'])
+            except queue.Empty:
+                continue
+            if event is _STOP:
+                return
+            batch = [event]
+            deadline = time.monotonic() + config['FLUSH_INTERVAL']
+            while len(batch) < config['BATCH_SIZE']:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = events.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    stopping.set()
+                    break
+                batch.append(event)
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            self._sink.write(batch)
+        except Exception:
+            metrics.inc('auth_audit_write_errors_total', sink=self._sink.name)
+            logger.exception('Failed to write %d audit event(s)', len(batch))
+        else:
+            metrics.inc('auth_audit_batches_written_total', sink=self._sink.name)
+
+    def _install_sigterm_handler(self):
+        """
+        Превращает SIGTERM в обычный выход (SystemExit), чтобы сработал atexit
+        и очередь была дописана. Gunicorn и uvicorn ставят свои обработчики —
+        их не трогаем; по умолчанию SIGTERM завершает процесс без atexit
+        (`runserver` в контейнере).
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        if signal.getsignal(signal.SIGTERM) is not signal.SIG_DFL:
+            return
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+
+audit = AuditLog()
+record = audit.record
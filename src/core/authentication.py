@@ -0,0 +1,31 @@
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from . import metrics
+
+
+class InstrumentedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация со счетчиком успешных и неуспешных проверок токена.
+    Claim арендатора в токене, если есть, должен совпадать с арендатором
+    пользователя: токен, выпущенный до переноса пользователя к другому
+    арендатору, отклоняется.
+    """
+
+    def get_validated_token(self, raw_token):
+        try:
+            token = super().get_validated_token(raw_token)
+        except InvalidToken:
+            metrics.inc('auth_tokens_verified_total', source='authentication', result='invalid')
+            raise
+        metrics.inc('auth_tokens_verified_total', source='authentication', result='valid')
+        return token
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        tenant_id = validated_token.get(settings.TENANCY['TOKEN_CLAIM'])
+        if tenant_id is not None and tenant_id != user.tenant_id:
+            metrics.inc('auth_tokens_verified_total', source='authentication', result='tenant_mismatch')
+            raise InvalidToken('Token tenant does not match the user tenant.')
+        return user
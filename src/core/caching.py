@@ -0,0 +1,106 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from rest_framework.response import Response
+
+from . import metrics
+from .rbac import PERMISSIONS_CACHE_TIMEOUT, get_rbac_version, rbac_version_key
+from .tenancy import request_tenant_id
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def user_etag(user):
+    """
+    ETag профиля: версия строки пользователя и имена его ролей (роли должны
+    быть предзагружены). Изменение полей пользователя меняет `updated_at`,
+    назначение или переименование роли — список имен.
+    """
+    return make_etag('user', user.pk, user.updated_at.isoformat(), sorted(role.name for role in user.roles.all()))
+
+
+def role_etag(role):
+    """
+    ETag роли: версия строки роли и id ее разрешений (должны быть предзагружены).
+    """
+    return make_etag('role', role.pk, role.updated_at.isoformat(), sorted(p.pk for p in role.permissions.all()))
+
+
+def _private_revalidate(response):
+    # Ответ зависит от пользователя: кэшировать только клиенту и всегда перепроверять по ETag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Accept', 'Authorization'))
+    return response
+
+
+class ConditionalRetrieveMixin:
+    """
+    `retrieve()` с ETag по версии объекта (`get_etag(instance)`).
+
+    Связи из `etag_prefetch` загружаются одним запросом и используются
+    и для ETag, и сериализатором. Если ETag совпал с `If-None-Match`,
+    ответ 304 возвращается без сериализации.
+    """
+    etag_prefetch = ()
+
+    def get_etag(self, instance):
+        raise NotImplementedError
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        prefetch_related_objects([instance], *self.etag_prefetch)
+        etag = self.get_etag(instance)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        response['ETag'] = etag
+        return _private_revalidate(response)
+
+
+class CachedCatalogListMixin:
+    """
+    `list()` справочника RBAC из кэша отрисованного JSON.
+
+    Запись кэша — своя у каждого арендатора — хранит версию RBAC
+    арендатора, из которой построена, и считается устаревшей при ее
+    изменении (сигналы в signals.py увеличивают версию при любом изменении
+    ролей, разрешений, ресурсов и действий арендатора). ETag —
+    хэш тела, поэтому 304 отдается одним обращением к кэшу, без SQL и
+    сериализации. Запросы с параметрами и не-JSON форматы (Browsable API)
+    идут обычным путем.
+    """
+    catalog_name = None
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if request.query_params or renderer.format != 'json' or ';' in request.accepted_media_type:
+            return super().list(request, *args, **kwargs)
+
+        tenant_id = request_tenant_id(request)
+        version_key = rbac_version_key(tenant_id)
+        key = f'rbac:catalog:{tenant_id}:{self.catalog_name}'
+        cached = cache.get_many([version_key, key])
+        version = cached.get(version_key)
+        if version is None:
+            version = get_rbac_version(tenant_id)
+        entry = cached.get(key)
+        if entry is not None and entry[0] == version:
+            metrics.inc('auth_authz_cache_lookups_total', cache='catalog', result='hit')
+            _, body, etag = entry
+        else:
+            metrics.inc('auth_authz_cache_lookups_total', cache='catalog', result='miss')
+            data = super().list(request, *args, **kwargs).data
+            body = renderer.render(data, request.accepted_media_type, self.get_renderer_context())
+            etag = make_etag(body)
+            cache.set(key, (version, body, etag), timeout=PERMISSIONS_CACHE_TIMEOUT)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type=renderer.media_type)
+        response['ETag'] = etag
+        return _private_revalidate(response)
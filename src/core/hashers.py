@@ -0,0 +1,22 @@
+import time
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from . import metrics
+
+
+class InstrumentedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-хэшер, замеряющий время хэширования.
+    Алгоритм и формат хэша совпадают со стандартным `pbkdf2_sha256`,
+    поэтому существующие пароли остаются валидными.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        started = time.perf_counter()
+        try:
+            return super().encode(password, salt, iterations)
+        finally:
+            metrics.observe(
+                'auth_password_hash_duration_seconds', time.perf_counter() - started, algorithm=self.algorithm
+            )
@@ -0,0 +1,156 @@
+import hashlib
+import logging
+import pkgutil
+import random
+import threading
+import time
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, Error, connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+
+logger = logging.getLogger(__name__)
+
+
+def disk_migrations():
+    """
+    Возвращает множество `(app_label, name)` миграций в коде.
+
+    Перечисляет файлы пакетов миграций, не импортируя сами миграции: загрузка
+    графа миграций (как в `migrate`) — самая дорогая часть проверки.
+    """
+    migrations = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue
+        try:
+            module = import_module(module_name)
+        except ModuleNotFoundError:
+            continue
+        if not hasattr(module, '__path__'):
+            continue
+        migrations.update(
+            (app_config.label, info.name)
+            for info in pkgutil.iter_modules(module.__path__)
+            if not info.ispkg and info.name[0] not in '_~'
+        )
+    return migrations
+
+
+def migration_fingerprint(migrations):
+    return hashlib.sha256('\n'.join(sorted(f'{app}.{name}' for app, name in migrations)).encode()).hexdigest()[:12]
+
+
+def pending_migrations(connection, migrations=None):
+    """
+    Миграции из кода, не записанные в `django_migrations` (два запроса).
+    """
+    if migrations is None:
+        migrations = disk_migrations()
+    recorder = MigrationRecorder(connection)
+    applied = set(recorder.applied_migrations()) if recorder.has_table() else set()
+    return migrations - applied
+
+
+def check_database(alias=DEFAULT_DB_ALIAS):
+    """
+    Выполняет `SELECT 1` через настроенный бэкенд. Возвращает текст ошибки
+    или None. Открытый порт еще не значит, что PostgreSQL принимает запросы
+    (например, во время восстановления после сбоя), поэтому проверяем запросом.
+    """
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Error as exc:
+        # Сломанное соединение не должно переиспользоваться следующей проверкой
+        connection.close()
+        return f'{type(exc).__name__}: {exc}'.strip()
+    return None
+
+
+def wait_for_database(timeout, max_delay, alias=DEFAULT_DB_ALIAS, log=logger.info):
+    """
+    Ждет, пока БД начнет отвечать на запросы, не дольше `timeout` секунд.
+
+    Паузы между попытками растут экспоненциально (0.1, 0.2, 0.4 ... до
+    `max_delay` секунд) со случайным разбросом "full jitter", чтобы реплики,
+    стартующие одновременно, не ломились в БД синхронно. Возвращает True,
+    если БД доступна.
+    """
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        error = check_database(alias)
+        if error is None:
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            log(f'Database is not ready after {timeout:g}s: {error}')
+            return False
+        delay = min(random.uniform(0, min(max_delay, 0.1 * 2 ** attempt)), remaining)
+        log(f'Database is not ready yet ({error}), retrying in {delay:.2f}s...')
+        time.sleep(delay)
+        attempt += 1
+
+
+class ReadinessProbe:
+    """
+    Результат проверки готовности (`/readyz`), закэшированный на
+    `HEALTH_CHECKS['CACHE_TTL']` секунд в памяти процесса.
+
+    Частые пробы балансировщика и оркестратора не превращаются в поток
+    запросов к БД, а кэш в памяти не зависит от внешнего кэша (Redis), который
+    сам может быть недоступен. Применение миграций проверяется до первого
+    успеха: дальше набор миграций меняется только с деплоем.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._result = None
+        self._expires = 0.0
+        self._migrated = False
+
+    def get(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._result is not None and now < self._expires:
+                return self._result
+            self._result = self._check()
+            self._expires = now + settings.HEALTH_CHECKS['CACHE_TTL']
+            return self._result
+
+    def _check(self):
+        checks = {}
+        error = check_database()
+        checks['database'] = {'status': 'ok'} if error is None else {'status': 'error', 'error': error}
+
+        if error is not None:
+            checks['migrations'] = {'status': 'unknown'}
+        elif self._migrated:
+            checks['migrations'] = {'status': 'ok'}
+        else:
+            try:
+                pending = pending_migrations(connections[DEFAULT_DB_ALIAS])
+            except Error as exc:
+                checks['migrations'] = {'status': 'error', 'error': f'{type(exc).__name__}: {exc}'.strip()}
+            else:
+                self._migrated = not pending
+                checks['migrations'] = (
+                    {'status': 'ok'} if not pending
+                    else {'status': 'pending', 'pending': sorted(f'{app}.{name}' for app, name in pending)}
+                )
+
+        ready = all(check['status'] == 'ok' for check in checks.values())
+        return {'status': 'ok' if ready else 'unavailable', 'checks': checks}
+
+
+readiness = ReadinessProbe()
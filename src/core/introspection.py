@@ -0,0 +1,166 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import UntypedToken
+
+from . import metrics
+from .models import CustomUser
+from .rbac import get_effective_permissions, get_rbac_version, rbac_version_key, user_rbac_key
+
+INACTIVE = {'active': False}
+
+
+def _entry_key(raw_token):
+    # Сам токен в ключ не кладем: ключи кэша могут попадать в логи и дампы
+    return 'introspect:token:' + hashlib.sha256(raw_token.encode()).hexdigest()
+
+
+def _watermark_key(user_id):
+    return f'introspect:watermark:{user_id}'
+
+
+def _revoked_key(jti):
+    return f'introspect:revoked:{jti}'
+
+
+def revoke_user_tokens(user):
+    """
+    Устанавливает "водяной знак" для пользователя: все токены, выпущенные
+    не позже текущего момента, считаются недействительными при интроспекции.
+    В отличие от черного списка, работает и для access-токенов.
+    """
+    lifetime = api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    cache.set(_watermark_key(user.pk), int(time.time()), timeout=int(lifetime))
+
+
+def revoke_jti(jti, expires_at):
+    """
+    Помечает токен с данным `jti` как отозванный до истечения его срока.
+    Вызывается при добавлении токена в черный список.
+    """
+    timeout = int(expires_at.timestamp() - time.time())
+    if timeout > 0:
+        cache.set(_revoked_key(jti), True, timeout=timeout)
+
+
+def _inspect(raw_token):
+    """
+    Полная (некэшированная) проверка одного токена.
+    Возвращает запись для кэша или None, если токен недействителен.
+    """
+    try:
+        token = UntypedToken(raw_token)
+    except TokenError:
+        return None
+
+    jti = token.get(api_settings.JTI_CLAIM)
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    token_type = token.get(api_settings.TOKEN_TYPE_CLAIM)
+    iat = token.get('iat', 0)
+    exp = token['exp']
+
+    if token_type == 'refresh' and BlacklistedToken.objects.filter(token__jti=jti).exists():
+        return None
+
+    watermark = cache.get(_watermark_key(user_id))
+    if watermark is not None and iat <= watermark:
+        return None
+
+    user_version = cache.get(user_rbac_key(user_id))
+    user = CustomUser.objects.filter(
+        **{api_settings.USER_ID_FIELD: user_id}, is_active=True
+    ).first()
+    if user is None:
+        return None
+    tenant_id = token.get(settings.TENANCY['TOKEN_CLAIM'])
+    if tenant_id is not None and tenant_id != user.tenant_id:
+        return None
+
+    # Версию читаем до прав: изменение, случившееся между чтениями, не закэшируется как актуальное
+    version = get_rbac_version(user.tenant_id)
+    roles, permissions = get_effective_permissions(user)
+    payload = {
+        'active': True,
+        'token_type': token_type,
+        'sub': str(user_id),
+        'user_id': user_id,
+        'tenant_id': user.tenant_id,
+        'email': user.email,
+        'is_superuser': user.is_superuser,
+        'roles': roles,
+        'permissions': permissions,
+        'jti': jti,
+        'iat': iat,
+        'exp': exp,
+    }
+    return {
+        'payload': payload,
+        'user_id': user_id,
+        'tenant_id': user.tenant_id,
+        'jti': jti,
+        'iat': iat,
+        'exp': exp,
+        'version': version,
+        'user_version': user_version,
+    }
+
+
+def introspect_tokens(raw_tokens):
+    """
+    Интроспекция списка токенов в духе RFC 7662.
+
+    Результаты кэшируются по токену до истечения его срока. Кэшированная
+    запись принимается только если не изменилась версия RBAC (арендатора
+    пользователя и версия ролей самого пользователя), токен не был отозван (черный список) и не
+    выпущен до "водяного знака" пользователя.
+    Все эти проверки для пачки токенов выполняются одним обращением к кэшу.
+    """
+    now = time.time()
+    keys = [_entry_key(raw) for raw in raw_tokens]
+    entries = cache.get_many(keys)
+
+    validity_keys = set()
+    for entry in entries.values():
+        # .get: записи, закэшированные до появления арендаторов, просто устареют
+        validity_keys.add(rbac_version_key(entry.get('tenant_id')))
+        validity_keys.add(_watermark_key(entry['user_id']))
+        validity_keys.add(user_rbac_key(entry['user_id']))
+        validity_keys.add(_revoked_key(entry['jti']))
+    validity = cache.get_many(list(validity_keys))
+
+    results = []
+    for raw, key in zip(raw_tokens, keys):
+        entry = entries.get(key)
+        if entry is not None:
+            watermark = validity.get(_watermark_key(entry['user_id']))
+            if (
+                entry['version'] == validity.get(rbac_version_key(entry.get('tenant_id')))
+                and entry['user_version'] == validity.get(user_rbac_key(entry['user_id']))
+                and entry['exp'] > now
+                and not validity.get(_revoked_key(entry['jti']))
+                and (watermark is None or entry['iat'] > watermark)
+            ):
+                metrics.inc('auth_authz_cache_lookups_total', cache='introspection', result='hit')
+                metrics.inc('auth_tokens_verified_total', source='introspection', result='valid')
+                results.append(entry['payload'])
+                continue
+
+        metrics.inc('auth_authz_cache_lookups_total', cache='introspection', result='miss')
+        stale = entry is not None
+        entry = _inspect(raw)
+        if entry is None:
+            # Отрицательные ответы не кэшируем, чтобы мусорные токены не вытесняли кэш
+            if stale:
+                cache.delete(key)
+            metrics.inc('auth_tokens_verified_total', source='introspection', result='invalid')
+            results.append(INACTIVE)
+            continue
+        metrics.inc('auth_tokens_verified_total', source='introspection', result='valid')
+        cache.set(key, entry, timeout=max(int(entry['exp'] - now), 1))
+        results.append(entry['payload'])
+    return results
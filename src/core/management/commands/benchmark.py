@@ -0,0 +1,210 @@
+import json
+import platform
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.management.commands.seed_db import SYNTHETIC_EMAIL_DOMAIN, SYNTHETIC_PASSWORD
+from core.models import CustomUser
+from core.serializers import TenantTokenObtainPairSerializer
+from core.throttling import SlidingWindowRateThrottle
+
+SCENARIOS = ('login', 'refresh', 'profile', 'secret', 'admin_roles')
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs an in-process load test against the API endpoints and reports '
+        'throughput, latency percentiles and DB queries per request as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS),
+                            help='Сценарии для прогона.')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Количество измеряемых запросов на сценарий.')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Количество неизмеряемых запросов перед каждым сценарием.')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Количество параллельных потоков-клиентов.')
+        parser.add_argument('--seed-users', type=int, default=0,
+                            help='Перед прогоном вызвать seed_db с указанным числом пользователей.')
+        parser.add_argument('--seed-roles', type=int, default=10,
+                            help='Число синтетических ролей для seed_db.')
+        parser.add_argument('--seed-resources', type=int, default=10,
+                            help='Число синтетических ресурсов для seed_db.')
+        parser.add_argument('--with-throttling', action='store_true',
+                            help='Не отключать ограничение частоты запросов на время прогона.')
+        parser.add_argument('--output', help='Путь к JSON-файлу с отчетом (по умолчанию stdout).')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive.')
+
+        if options['seed_users']:
+            call_command(
+                'seed_db',
+                users=options['seed_users'],
+                roles=options['seed_roles'],
+                resources=options['seed_resources'],
+                stdout=self.stderr,
+            )
+
+        users = list(
+            CustomUser.objects.filter(email__endswith=f'@{SYNTHETIC_EMAIL_DOMAIN}', is_active=True)
+            .order_by('id')[:options['requests'] + options['warmup']]
+        )
+        if not users:
+            raise CommandError(
+                'No synthetic users found. Run "seed_db --users N" or pass --seed-users N.'
+            )
+        superuser = CustomUser.objects.filter(is_superuser=True, is_active=True).first()
+
+        report = {
+            'meta': {
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'sampled_users': len(users),
+                'throttling': options['with_throttling'],
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            },
+            'scenarios': {},
+        }
+
+        throttle_rates = (
+            SlidingWindowRateThrottle.THROTTLE_RATES
+            if options['with_throttling']
+            else dict.fromkeys(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'])
+        )
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(ALLOWED_HOSTS=allowed_hosts), \
+                mock.patch.object(SlidingWindowRateThrottle, 'THROTTLE_RATES', throttle_rates):
+            for name in options['scenarios']:
+                total = options['requests'] + options['warmup']
+                jobs = self.build_jobs(name, users, superuser, total)
+                if jobs is None:
+                    report['scenarios'][name] = {'skipped': 'no active superuser'}
+                    continue
+                self.run_jobs(jobs[:options['warmup']], options['concurrency'])
+                report['scenarios'][name] = self.measure(jobs[options['warmup']:], options['concurrency'])
+                self.stderr.write(f'{name}: {report["scenarios"][name]["throughput_rps"]} req/s')
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def build_jobs(self, name, users, superuser, total):
+        """
+        Готовит список запросов `(method, path, data, headers, expected_status)`.
+        Токены выпускаются заранее, чтобы их генерация не попадала в замеры.
+        """
+        sample = list(islice(cycle(users), total))
+
+        def bearer(user):
+            return {'HTTP_AUTHORIZATION': f'Bearer {TenantTokenObtainPairSerializer.get_token(user).access_token}'}
+
+        if name == 'login':
+            return [
+                ('post', reverse('token_obtain_pair'), {'email': user.email, 'password': SYNTHETIC_PASSWORD}, {}, 200)
+                for user in sample
+            ]
+        if name == 'refresh':
+            # Каждый refresh-токен одноразовый из-за ROTATE_REFRESH_TOKENS
+            return [
+                ('post', reverse('token_refresh'), {'refresh': str(TenantTokenObtainPairSerializer.get_token(user))}, {}, 200)
+                for user in sample
+            ]
+        if name in ('profile', 'secret'):
+            url = reverse('auth_profile' if name == 'profile' else 'secret_document')
+            headers = {user.pk: bearer(user) for user in users}
+            return [('get', url, None, headers[user.pk], 200) for user in sample]
+        if name == 'admin_roles':
+            if superuser is None:
+                return None
+            headers = bearer(superuser)
+            return [('get', reverse('role-list'), None, headers, 200)] * total
+        raise CommandError(f'Unknown scenario: {name}')
+
+    def run_jobs(self, jobs, concurrency):
+        """
+        Выполняет запросы в `concurrency` потоках и возвращает список
+        `(latency_seconds, queries, ok)` и общее время выполнения.
+        """
+        if not jobs:
+            return [], 0.0
+        started = time.perf_counter()
+        if concurrency == 1:
+            # В текущем потоке: данные видны даже внутри незакоммиченной транзакции
+            samples = self.run_chunk(jobs, close_connections=False)
+        else:
+            chunks = [jobs[i::concurrency] for i in range(concurrency)]
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                samples = [sample for chunk in executor.map(self.run_chunk, chunks) for sample in chunk]
+        return samples, time.perf_counter() - started
+
+    def run_chunk(self, jobs, close_connections=True):
+        client = Client()
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        samples = []
+        try:
+            with connection.execute_wrapper(count_queries):
+                for method, path, data, headers, expected_status in jobs:
+                    queries = 0
+                    started = time.perf_counter()
+                    if method == 'post':
+                        response = client.post(path, data, content_type='application/json', **headers)
+                    else:
+                        response = client.get(path, **headers)
+                    latency = time.perf_counter() - started
+                    samples.append((latency, queries, response.status_code == expected_status))
+        finally:
+            if close_connections:
+                connections.close_all()
+        return samples
+
+    def measure(self, jobs, concurrency):
+        samples, elapsed = self.run_jobs(jobs, concurrency)
+        latencies_ms = sorted(latency * 1000 for latency, _, _ in samples)
+        if len(latencies_ms) > 1:
+            percentiles = statistics.quantiles(latencies_ms, n=100, method='inclusive')
+            p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+        else:
+            p50 = p95 = p99 = latencies_ms[0]
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for _, _, ok in samples if not ok),
+            'elapsed_s': round(elapsed, 4),
+            'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+            'latency_ms': {
+                'mean': round(statistics.fmean(latencies_ms), 3),
+                'p50': round(p50, 3),
+                'p95': round(p95, 3),
+                'p99': round(p99, 3),
+                'max': round(latencies_ms[-1], 3),
+            },
+            'queries_per_request': round(statistics.fmean(q for _, q, _ in samples), 2),
+        }
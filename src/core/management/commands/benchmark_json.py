@@ -0,0 +1,127 @@
+import io
+import json
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ModelSerializer
+
+from core.models import CustomUser, Permission
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+from core.serializers import PermissionSerializer, TenantTokenObtainPairSerializer, UserSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Micro-benchmarks request parsing, serialization and response rendering per endpoint: '
+        'DRF defaults vs the orjson renderer/parser and serializer fast paths. Reports JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000,
+                            help='Количество повторов каждой операции.')
+        parser.add_argument('--permissions', type=int, default=100,
+                            help='Сколько разрешений в ответе справочника.')
+        parser.add_argument('--output', help='Путь к JSON-файлу с отчетом (по умолчанию stdout).')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be positive.')
+        user = CustomUser.objects.filter(is_active=True).prefetch_related('roles').order_by('id').first()
+        permissions = list(Permission.objects.select_related('resource', 'action')[:options['permissions']])
+        if user is None or not permissions:
+            raise CommandError('No users or permissions found. Run "seed_db" first.')
+
+        refresh = TenantTokenObtainPairSerializer.get_token(user)
+        token_pair = {'refresh': str(refresh), 'access': str(refresh.access_token)}
+        bodies = {
+            'login': json.dumps({'email': user.email, 'password': 'password'}).encode(),
+            'refresh': json.dumps({'refresh': token_pair['refresh']}).encode(),
+        }
+
+        def parse(parser, body):
+            return lambda: parser.parse(io.BytesIO(body))
+
+        def render(renderer, data):
+            return lambda: renderer.render(data)
+
+        def serialize_user(fast):
+            def run():
+                serializer = UserSerializer(user)
+                return serializer.to_representation(user) if fast else ModelSerializer.to_representation(serializer, user)
+            return run
+
+        def serialize_permissions(fast):
+            def run():
+                child = PermissionSerializer(permissions, many=True).child
+                to_representation = child.to_representation if fast else ModelSerializer.to_representation.__get__(child)
+                return [to_representation(permission) for permission in permissions]
+            return run
+
+        profile = UserSerializer(user).data
+        catalog = PermissionSerializer(permissions, many=True).data
+        baseline_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        baseline_parser, fast_parser = JSONParser(), FastJSONParser()
+
+        # Эндпоинт -> [(этап, базовый вариант, быстрый вариант)]
+        endpoints = {
+            'login': [
+                ('parse', parse(baseline_parser, bodies['login']), parse(fast_parser, bodies['login'])),
+                ('render', render(baseline_renderer, token_pair), render(fast_renderer, token_pair)),
+            ],
+            'refresh': [
+                ('parse', parse(baseline_parser, bodies['refresh']), parse(fast_parser, bodies['refresh'])),
+                ('render', render(baseline_renderer, token_pair), render(fast_renderer, token_pair)),
+            ],
+            'profile': [
+                ('serialize', serialize_user(False), serialize_user(True)),
+                ('render', render(baseline_renderer, profile), render(fast_renderer, profile)),
+            ],
+            'permissions': [
+                ('serialize', serialize_permissions(False), serialize_permissions(True)),
+                ('render', render(baseline_renderer, catalog), render(fast_renderer, catalog)),
+            ],
+        }
+
+        report = {
+            'meta': {
+                'iterations': options['iterations'],
+                'permissions': len(permissions),
+                'orjson': orjson.__version__ if orjson else None,
+            },
+            'endpoints': {},
+        }
+        for endpoint, stages in endpoints.items():
+            result = {'stages': {}, 'baseline_us': 0.0, 'fast_us': 0.0}
+            for stage, baseline, fast in stages:
+                if baseline() != fast():
+                    raise CommandError(f'{endpoint}/{stage}: fast path output differs from baseline.')
+                baseline_us = self.measure(baseline, options['iterations'])
+                fast_us = self.measure(fast, options['iterations'])
+                result['stages'][stage] = {
+                    'baseline_us': baseline_us,
+                    'fast_us': fast_us,
+                    'speedup': round(baseline_us / fast_us, 2),
+                }
+                result['baseline_us'] += baseline_us
+                result['fast_us'] += fast_us
+            result['baseline_us'] = round(result['baseline_us'], 2)
+            result['fast_us'] = round(result['fast_us'], 2)
+            result['speedup'] = round(result['baseline_us'] / result['fast_us'], 2)
+            report['endpoints'][endpoint] = result
+            self.stderr.write(f'{endpoint}: {result["baseline_us"]} us -> {result["fast_us"]} us ({result["speedup"]}x)')
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def measure(self, func, iterations):
+        """
+        Лучшее из трех измерений, мкс на операцию.
+        """
+        return round(min(timeit.repeat(func, number=iterations, repeat=3)) / iterations * 1e6, 2)
@@ -0,0 +1,110 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном процессе: время импорта и инициализации Django,
+# загрузки urlconf и создания WSGI-приложения
+STARTUP_SNIPPET = '''
+import json, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.conf import settings
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    'setup_ms': (time.perf_counter() - started) * 1000,
+    'installed_apps': len(settings.INSTALLED_APPS),
+    'middleware': len(settings.MIDDLEWARE),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares startup time and per-request overhead of deployment profiles '
+        '(DJANGO_PROFILE=full vs DJANGO_PROFILE=api) and reports the result as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', default=['full', 'api'],
+                            help='Профили для сравнения.')
+        parser.add_argument('--startup-runs', type=int, default=5,
+                            help='Сколько раз запускать процесс для замера старта.')
+        parser.add_argument('--scenarios', nargs='+', default=['profile', 'secret'],
+                            help='Сценарии команды benchmark для замера накладных расходов на запрос.')
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Количество запросов на сценарий.')
+        parser.add_argument('--skip-requests', action='store_true',
+                            help='Замерить только время старта.')
+        parser.add_argument('--output', help='Путь к JSON-файлу с отчетом (по умолчанию stdout).')
+
+    def handle(self, *args, **options):
+        report = {}
+        for profile in options['profiles']:
+            env = dict(os.environ, DJANGO_PROFILE=profile)
+            runs = [self.measure_startup(env) for _ in range(options['startup_runs'])]
+            result = {
+                'installed_apps': runs[0]['installed_apps'],
+                'middleware': runs[0]['middleware'],
+                'startup_ms': {
+                    'setup_median': round(statistics.median(run['setup_ms'] for run in runs), 1),
+                    'process_median': round(statistics.median(run['process_ms'] for run in runs), 1),
+                },
+            }
+            if not options['skip_requests']:
+                result['scenarios'] = self.measure_requests(env, options)
+            report[profile] = result
+            self.stderr.write(f'{profile}: startup {result["startup_ms"]["setup_median"]} ms')
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def measure_startup(self, env):
+        started = time.monotonic()
+        completed = subprocess.run(
+            [sys.executable, '-c', STARTUP_SNIPPET],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        process_ms = (time.monotonic() - started) * 1000
+        if completed.returncode:
+            raise CommandError(f'Startup probe failed:\n{completed.stderr}')
+        return dict(json.loads(completed.stdout.strip().splitlines()[-1]), process_ms=process_ms)
+
+    def measure_requests(self, env, options):
+        """
+        Прогоняет команду `benchmark` в процессе с нужным профилем.
+        Один поток, чтобы сравнивать накладные расходы, а не параллелизм.
+        """
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            completed = subprocess.run(
+                [
+                    sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark',
+                    '--scenarios', *options['scenarios'],
+                    '--requests', str(options['requests']),
+                    '--concurrency', '1',
+                    '--output', output.name,
+                ],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if completed.returncode:
+                raise CommandError(f'Benchmark failed:\n{completed.stderr}')
+            scenarios = json.load(output)['scenarios']
+        return {
+            name: {
+                'throughput_rps': result['throughput_rps'],
+                'latency_ms': result['latency_ms'],
+            }
+            for name, result in scenarios.items()
+        }
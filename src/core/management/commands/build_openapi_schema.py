@@ -0,0 +1,32 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.schema import build_schema
+
+
+class Command(BaseCommand):
+    help = (
+        'Builds the OpenAPI document and writes it to OPENAPI_SCHEMA_FILE. '
+        'Run at image build time so that schema requests are served from memory.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Путь к файлу схемы (по умолчанию OPENAPI_SCHEMA_FILE).')
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.OPENAPI_SCHEMA_FILE
+        body = build_schema()
+
+        # Атомарная замена: работающий процесс не прочитает недописанный файл
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'OpenAPI schema written to {path} '
+            f'({len(body)} bytes, sha256 {hashlib.sha256(body).hexdigest()[:12]}).'
+        ))
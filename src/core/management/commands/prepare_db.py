@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.health import disk_migrations, migration_fingerprint, pending_migrations, wait_for_database
+from .seed_db import Command as SeedCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Prepares the database on container start: waits for it, then runs migrate and '
+        'seed_db in-process, skipping both when every migration in the code is already applied.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Выполнить migrate и seed_db без проверки состояния миграций.')
+        parser.add_argument('--wait-timeout', type=float, default=settings.HEALTH_CHECKS['DB_WAIT_TIMEOUT'],
+                            help='Сколько секунд ждать доступности БД.')
+
+    def handle(self, *args, **options):
+        # Ожидание в том же процессе: отдельный запуск wait_for_db стоил бы еще одной загрузки Django
+        if not wait_for_database(options['wait_timeout'], settings.HEALTH_CHECKS['DB_WAIT_MAX_DELAY'],
+                                 log=self.stderr.write):
+            raise CommandError('Timeout waiting for database.')
+
+        migrations = disk_migrations()
+        fingerprint = migration_fingerprint(migrations)
+        pending = pending_migrations(connection, migrations)
+
+        if not pending and not options['force']:
+            # Миграции применены тем же образом раньше. Сидер в конце прошлого
+            # запуска мог упасть, поэтому его дешевую проверку (два запроса)
+            # все же выполняем — без отдельного процесса
+            if SeedCommand().is_seeded():
+                self.stdout.write(f'Migration state {fingerprint} is up to date, skipping migrate and seed_db.')
+                return
+        else:
+            self.stdout.write(f'Migration state {fingerprint}: {len(pending)} pending migration(s).')
+            call_command('migrate', interactive=False, stdout=self.stdout)
+
+        call_command('seed_db', stdout=self.stdout)
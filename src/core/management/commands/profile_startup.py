@@ -0,0 +1,155 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном процессе под `python -X importtime`: замеряет фазы
+# старта и время импорта модуля, загрузки моделей и ready() каждого приложения
+STARTUP_SNIPPET = '''
+import json, time
+started = time.perf_counter()
+from django.apps import config
+
+apps = {}
+create = config.AppConfig.create.__func__
+
+
+def timed(label, key, method):
+    def wrapper(*args, **kwargs):
+        method_started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            apps.setdefault(label, {})[key] = (time.perf_counter() - method_started) * 1000
+    return wrapper
+
+
+def create_timed(cls, entry):
+    create_started = time.perf_counter()
+    app_config = create(cls, entry)
+    apps.setdefault(app_config.label, {})['import_ms'] = (time.perf_counter() - create_started) * 1000
+    app_config.import_models = timed(app_config.label, 'models_ms', app_config.import_models)
+    app_config.ready = timed(app_config.label, 'ready_ms', app_config.ready)
+    return app_config
+
+
+config.AppConfig.create = classmethod(create_timed)
+
+phases = {}
+mark = time.perf_counter()
+from django.conf import settings
+settings.INSTALLED_APPS
+phases['settings_ms'] = (time.perf_counter() - mark) * 1000
+
+mark = time.perf_counter()
+import django
+django.setup()
+phases['apps_ms'] = (time.perf_counter() - mark) * 1000
+
+mark = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+phases['middleware_ms'] = (time.perf_counter() - mark) * 1000
+
+mark = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+phases['urlconf_ms'] = (time.perf_counter() - mark) * 1000
+
+phases['total_ms'] = (time.perf_counter() - started) * 1000
+print(json.dumps({'phases': phases, 'apps': apps}))
+'''
+
+
+def parse_importtime(output):
+    """
+    Разбирает вывод `-X importtime` в `{модуль: (self_us, cumulative_us)}`.
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            # Строка заголовка
+            continue
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Profiles process startup in a fresh interpreter: time per startup phase, '
+        'import/models/ready() time per app and the most expensive imports, as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3,
+                            help='Количество запусков (берется медиана).')
+        parser.add_argument('--top', type=int, default=20,
+                            help='Сколько самых дорогих модулей и пакетов показать.')
+        parser.add_argument('--output', help='Путь к JSON-файлу с отчетом (по умолчанию stdout).')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be positive.')
+        runs = [self.run_probe() for _ in range(options['runs'])]
+
+        def median(values):
+            return round(statistics.median(values), 2)
+
+        phases = {key: median(run['phases'][key] for run in runs) for key in runs[0]['phases']}
+        apps = {
+            label: {key: median(run['apps'].get(label, {}).get(key, 0.0) for run in runs) for key in timings}
+            for label, timings in runs[0]['apps'].items()
+        }
+
+        # Собственное время импорта, просуммированное по пакетам верхнего уровня
+        packages = {}
+        for run in runs:
+            totals = {}
+            for module, (self_us, _) in run['imports'].items():
+                package = module.split('.')[0]
+                totals[package] = totals.get(package, 0) + self_us
+            for package, total in totals.items():
+                packages.setdefault(package, []).append(total / 1000)
+        packages = {package: median(values + [0.0] * (len(runs) - len(values))) for package, values in packages.items()}
+
+        imports = runs[-1]['imports']
+        report = {
+            'meta': {
+                'profile': settings.DEPLOYMENT_PROFILE,
+                'python': sys.version.split()[0],
+                'runs': options['runs'],
+                'modules_imported': len(imports),
+            },
+            'phases_ms': phases,
+            'apps_ms': dict(sorted(apps.items(), key=lambda item: -sum(item[1].values()))),
+            'packages_self_ms': dict(sorted(packages.items(), key=lambda item: -item[1])[:options['top']]),
+            'modules_cumulative_ms': {
+                module: round(cumulative_us / 1000, 2)
+                for module, (_, cumulative_us) in sorted(imports.items(), key=lambda item: -item[1][1])[:options['top']]
+            },
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def run_probe(self):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SNIPPET],
+            cwd=settings.BASE_DIR, env=dict(os.environ), capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(f'Startup probe failed:\n{completed.stderr}')
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result['imports'] = parse_importtime(completed.stderr)
+        return result
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.rbac import refresh_effective_permissions
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the denormalized UserEffectivePermission table from user roles and role '
+        'permissions, adding missing rows and removing stale ones. Safe to run periodically '
+        'to repair drift after raw SQL changes or bulk loads that bypass signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Пересчитать только этого пользователя (можно повторять).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            granted, deleted = refresh_effective_permissions(users=options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Effective permissions refreshed in {time.perf_counter() - started:.2f}s: '
+            f'{granted} added, {deleted} removed.'
+        ))
@@ -1,69 +1,244 @@
+import csv
+import io
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import connection, transaction
+from django.utils import timezone
 from core.models import Action, Resource, Permission, Role, CustomUser
+from core.rbac import bump_rbac_version, refresh_effective_permissions
+
+# Базовые данные: действия, ресурсы, роли с их разрешениями и пользователи
+BASE_ACTIONS = ['read', 'write', 'delete', 'introspect']
+BASE_RESOURCES = ['SecretDocument', 'UserProfile', 'Token']
+BASE_ROLES = {
+    # Роль "Администратор" с полными правами
+    'Admin': [
+        ('read', 'SecretDocument'), ('write', 'SecretDocument'),
+        ('read', 'UserProfile'), ('write', 'UserProfile'),
+    ],
+    # Роль "Пользователь" с ограниченными правами
+    'User': [('read', 'SecretDocument'), ('read', 'UserProfile')],
+    # Роль "Шлюз" для сервисных аккаунтов API-шлюза
+    'Gateway': [('introspect', 'Token')],
+}
+BASE_USERS = [
+    # email, пароль, суперпользователь, роль
+    ('admin@example.com', 'adminpassword', True, 'Admin'),
+    ('user@example.com', 'userpassword', False, 'User'),
+]
+
+SYNTHETIC_ACTIONS = ['read', 'write', 'delete']
+SYNTHETIC_EMAIL_DOMAIN = 'bench.local'
+SYNTHETIC_PASSWORD = 'benchpassword'
+SYNTHETIC_ROLE_PREFIX = 'BenchRole'
+SYNTHETIC_RESOURCE_PREFIX = 'BenchResource'
+
 
 class Command(BaseCommand):
-    help = 'Seeds the database with initial data for roles and permissions.'
+    help = 'Seeds the database with initial data for roles and permissions (in the default tenant).'
+
+    @property
+    def tenant_id(self):
+        # Базовые и синтетические данные — в арендаторе по умолчанию
+        return settings.TENANCY['DEFAULT_TENANT_ID']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=0,
+                            help='Количество синтетических пользователей (для нагрузочных тестов).')
+        parser.add_argument('--roles', type=int, default=0,
+                            help='Количество синтетических ролей.')
+        parser.add_argument('--resources', type=int, default=0,
+                            help='Количество синтетических ресурсов (по разрешению на каждое действие).')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Размер пакета вставки (и одной транзакции) для синтетических данных.')
+        parser.add_argument('--random-seed', type=int, default=42,
+                            help='Зерно генератора для воспроизводимого RBAC-графа.')
 
-    @transaction.atomic
     def handle(self, *args, **options):
+        synthetic = options['users'] or options['roles'] or options['resources']
+
+        # Быстрый путь для старта контейнера: данные уже на месте — ничего не делаем
+        if self.is_seeded():
+            if not synthetic:
+                self.stdout.write('Database is already seeded, skipping.')
+                return
+        else:
+            self.seed_base()
+
+        if synthetic:
+            self.seed_synthetic(options)
+
+        self.stdout.write(self.style.SUCCESS('Database seeding complete.'))
+
+    def is_seeded(self):
+        """
+        Проверяет наличие базовых данных двумя запросами по уникальным индексам.
+        Разрешения ролей назначаются при создании роли, поэтому их наличие
+        следует из наличия ролей.
+        """
+        return (
+            Role.objects.filter(tenant_id=self.tenant_id, name__in=BASE_ROLES).count() == len(BASE_ROLES)
+            and CustomUser.objects.filter(email__in=[user[0] for user in BASE_USERS]).count() == len(BASE_USERS)
+        )
+
+    @transaction.atomic
+    def seed_base(self):
         self.stdout.write('Seeding database...')
 
         # Создаем действия
-        actions_to_create = ['read', 'write', 'delete']
         actions = {}
-        for action_name in actions_to_create:
-            action, created = Action.objects.get_or_create(name=action_name)
+        for action_name in BASE_ACTIONS:
+            action, created = Action.objects.get_or_create(tenant_id=self.tenant_id, name=action_name)
             actions[action_name] = action
             if created:
                 self.stdout.write(self.style.SUCCESS(f'Action "{action_name}" created.'))
 
         # Создаем ресурсы
-        resources_to_create = ['SecretDocument', 'UserProfile']
         resources = {}
-        for resource_name in resources_to_create:
-            resource, created = Resource.objects.get_or_create(name=resource_name)
+        for resource_name in BASE_RESOURCES:
+            resource, created = Resource.objects.get_or_create(tenant_id=self.tenant_id, name=resource_name)
             resources[resource_name] = resource
             if created:
                 self.stdout.write(self.style.SUCCESS(f'Resource "{resource_name}" created.'))
 
         # Создаем разрешения
-        read_secret_perm, _ = Permission.objects.get_or_create(
-            resource=resources['SecretDocument'], action=actions['read']
-        )
-        write_secret_perm, _ = Permission.objects.get_or_create(
-            resource=resources['SecretDocument'], action=actions['write']
-        )
-        read_profile_perm, _ = Permission.objects.get_or_create(
-            resource=resources['UserProfile'], action=actions['read']
-        )
-        write_profile_perm, _ = Permission.objects.get_or_create(
-            resource=resources['UserProfile'], action=actions['write']
-        )
+        permissions = {}
+        for role_permissions in BASE_ROLES.values():
+            for action_name, resource_name in role_permissions:
+                if (action_name, resource_name) not in permissions:
+                    permissions[action_name, resource_name], _ = Permission.objects.get_or_create(
+                        resource=resources[resource_name], action=actions[action_name]
+                    )
 
         # Создаем роли и назначаем разрешения
-        # Роль "Администратор" с полными правами
-        admin_role, created = Role.objects.get_or_create(name='Admin')
-        if created:
-            admin_role.permissions.add(read_secret_perm, write_secret_perm, read_profile_perm, write_profile_perm)
-            self.stdout.write(self.style.SUCCESS('Role "Admin" created and all permissions assigned.'))
-
-        # Роль "Пользователь" с ограниченными правами
-        user_role, created = Role.objects.get_or_create(name='User')
-        if created:
-            user_role.permissions.add(read_secret_perm, read_profile_perm)
-            self.stdout.write(self.style.SUCCESS('Role "User" created and assigned read permissions.'))
+        roles = {}
+        for role_name, role_permissions in BASE_ROLES.items():
+            role, created = Role.objects.get_or_create(tenant_id=self.tenant_id, name=role_name)
+            roles[role_name] = role
+            if created:
+                role.permissions.add(*(permissions[key] for key in role_permissions))
+                self.stdout.write(self.style.SUCCESS(f'Role "{role_name}" created and permissions assigned.'))
 
         # Создаем пользователей
-        if not CustomUser.objects.filter(email='admin@example.com').exists():
-            admin_user = CustomUser.objects.create_superuser('admin@example.com', 'adminpassword')
-            admin_user.roles.add(admin_role)
-            self.stdout.write(self.style.SUCCESS('Superuser "admin@example.com" created.'))
+        for email, password, is_superuser, role_name in BASE_USERS:
+            if CustomUser.objects.filter(email=email).exists():
+                continue
+            if is_superuser:
+                user = CustomUser.objects.create_superuser(email, password)
+            else:
+                user = CustomUser.objects.create_user(email, password)
+            user.roles.add(roles[role_name])
+            self.stdout.write(self.style.SUCCESS(f'User "{email}" created.'))
 
-        if not CustomUser.objects.filter(email='user@example.com').exists():
-            user = CustomUser.objects.create_user('user@example.com', 'userpassword')
-            user.roles.add(user_role)
-            self.stdout.write(self.style.SUCCESS('User "user@example.com" created.'))
+    def seed_synthetic(self, options):
+        """
+        Дозаполняет синтетический RBAC-граф до заданных размеров.
 
-        self.stdout.write(self.style.SUCCESS('Database seeding complete.'))
+        Имена детерминированы (`BenchResource<i>`, `BenchRole<i>`,
+        `user<i>@bench.local`), поэтому повторный запуск создает только
+        недостающее. Данные вставляются пакетами по `--batch-size`, каждый
+        пакет — отдельная транзакция; на PostgreSQL используется COPY.
+        """
+        started = time.perf_counter()
+        batch_size = options['batch_size']
+        rng = random.Random(options['random_seed'])
+
+        tenant_id = self.tenant_id
+        actions = list(Action.objects.filter(tenant_id=tenant_id, name__in=SYNTHETIC_ACTIONS))
+        default_role_id = Role.objects.values_list('id', flat=True).get(tenant_id=tenant_id, name='User')
+        resources = Resource.objects.filter(tenant_id=tenant_id)
+        roles = Role.objects.filter(tenant_id=tenant_id)
+
+        # Ресурсы и разрешения на каждое базовое действие
+        existing = resources.filter(name__startswith=SYNTHETIC_RESOURCE_PREFIX).count()
+        for start in range(existing, options['resources'], batch_size):
+            names = [f'{SYNTHETIC_RESOURCE_PREFIX}{i}' for i in range(start, min(start + batch_size, options['resources']))]
+            with transaction.atomic():
+                self.insert_rows(Resource, ['tenant', 'name'], [(tenant_id, name) for name in names])
+                resource_ids = resources.filter(name__in=names).values_list('id', flat=True)
+                self.insert_rows(
+                    Permission, ['tenant', 'resource', 'action'],
+                    [(tenant_id, resource_id, action.id) for resource_id in resource_ids for action in actions],
+                )
+
+        # Роли получают случайное подмножество синтетических разрешений:
+        # от узких (пара разрешений) до широких (десятки)
+        now = timezone.now()
+        permission_ids = list(
+            Permission.objects.filter(tenant_id=tenant_id, resource__name__startswith=SYNTHETIC_RESOURCE_PREFIX)
+            .values_list('id', flat=True)
+        )
+        existing = roles.filter(name__startswith=SYNTHETIC_ROLE_PREFIX).count()
+        for start in range(existing, options['roles'], batch_size):
+            names = [f'{SYNTHETIC_ROLE_PREFIX}{i}' for i in range(start, min(start + batch_size, options['roles']))]
+            with transaction.atomic():
+                self.insert_rows(Role, ['tenant', 'name', 'updated_at'], [(tenant_id, name, now) for name in names])
+                role_ids = roles.filter(name__in=names).values_list('id', flat=True)
+                rows = []
+                for role_id in role_ids:
+                    size = min(len(permission_ids), max(1, int(rng.paretovariate(1.5) * 2)))
+                    rows += [(role_id, permission_id) for permission_id in rng.sample(permission_ids, size)]
+                self.insert_rows(Role.permissions.through, ['role', 'permission'], rows)
+
+        # Пользователи: у всех роль "User" и 0-3 синтетические роли,
+        # популярность ролей убывает по закону Ципфа
+        role_ids = list(
+            roles.filter(name__startswith=SYNTHETIC_ROLE_PREFIX).order_by('id').values_list('id', flat=True)
+        )
+        weights = [1 / (rank + 1) for rank in range(len(role_ids))]
+        # Один хэш на всех: PBKDF2 для каждого пользователя занял бы часы
+        password = make_password(SYNTHETIC_PASSWORD)
+        existing = CustomUser.objects.filter(email__endswith=f'@{SYNTHETIC_EMAIL_DOMAIN}').count()
+        for start in range(existing, options['users'], batch_size):
+            emails = [f'user{i}@{SYNTHETIC_EMAIL_DOMAIN}' for i in range(start, min(start + batch_size, options['users']))]
+            with transaction.atomic():
+                self.insert_rows(
+                    CustomUser,
+                    ['password', 'is_superuser', 'email', 'tenant', 'first_name', 'last_name', 'is_staff',
+                     'is_active', 'date_joined', 'updated_at'],
+                    [(password, False, email, tenant_id, '', '', False, True, now, now) for email in emails],
+                )
+                rows = []
+                user_ids = list(CustomUser.objects.filter(email__in=emails).values_list('id', flat=True))
+                for user_id in user_ids:
+                    rows.append((user_id, default_role_id))
+                    if role_ids:
+                        count = rng.choices((0, 1, 2, 3), weights=(10, 60, 20, 10))[0]
+                        rows += [(user_id, role_id) for role_id in set(rng.choices(role_ids, weights, k=count))]
+                self.insert_rows(CustomUser.roles.through, ['customuser', 'role'], rows)
+                # Массовая вставка минует сигналы: эффективные права пакета — одним INSERT ... SELECT
+                refresh_effective_permissions(users=user_ids, revoke=False)
+            self.stdout.write(f'Synthetic users: {start + len(emails)}/{options["users"]}')
+
+        # COPY и bulk_create минуют сигналы: сбрасываем кэши RBAC арендатора
+        # (в том числе списки ролей, разрешений и ресурсов) явно, один раз
+        bump_rbac_version(tenant_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Synthetic data ready in {time.perf_counter() - started:.1f}s: '
+            f'{options["users"]} users, {options["roles"]} roles, {options["resources"]} resources.'
+        ))
 
+    def insert_rows(self, model, fields, rows):
+        """
+        Массовая вставка строк (кортежей значений полей `fields`).
+        На PostgreSQL — через COPY, иначе — через bulk_create.
+        """
+        if not rows:
+            return
+        model_fields = [model._meta.get_field(name) for name in fields]
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            columns = ', '.join(connection.ops.quote_name(field.column) for field in model_fields)
+            table = connection.ops.quote_name(model._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+        else:
+            attnames = [field.attname for field in model_fields]
+            model.objects.bulk_create([model(**dict(zip(attnames, row))) for row in rows])
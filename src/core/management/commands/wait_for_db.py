@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.health import wait_for_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Waits until the database answers "SELECT 1", retrying with exponential '
+        'backoff and jitter. Exits with an error after --timeout seconds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=settings.HEALTH_CHECKS['DB_WAIT_TIMEOUT'],
+                            help='Сколько секунд ждать доступности БД.')
+        parser.add_argument('--max-delay', type=float, default=settings.HEALTH_CHECKS['DB_WAIT_MAX_DELAY'],
+                            help='Максимальная пауза между попытками, секунд.')
+
+    def handle(self, *args, **options):
+        if not wait_for_database(options['timeout'], options['max_delay'], log=self.stderr.write):
+            raise CommandError('Timeout waiting for database.')
+        self.stdout.write(self.style.SUCCESS('Database is ready!'))
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PASSWORD_HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Описание метрик: имя -> (тип, описание, границы корзин гистограммы)
+DEFINITIONS = {
+    'auth_http_request_duration_seconds': (
+        'histogram', 'HTTP request latency by view, method and status.', LATENCY_BUCKETS,
+    ),
+    'auth_db_queries_total': ('counter', 'Database queries executed, by view.', None),
+    'auth_db_query_duration_seconds_total': ('counter', 'Time spent in database queries, by view.', None),
+    'auth_authz_cache_lookups_total': (
+        'counter', 'Authorization cache lookups by cache and result (hit/miss).', None,
+    ),
+    'auth_password_hash_duration_seconds': (
+        'histogram', 'Password hashing time by algorithm.', PASSWORD_HASH_BUCKETS,
+    ),
+    'auth_tokens_issued_total': ('counter', 'JWT pairs issued, by grant (password/refresh).', None),
+    'auth_tokens_verified_total': ('counter', 'JWT verifications, by source and result.', None),
+    'auth_audit_events_total': ('counter', 'Audit events by event and result (queued/dropped/skipped).', None),
+    'auth_audit_batches_written_total': ('counter', 'Audit batches written, by sink.', None),
+    'auth_audit_write_errors_total': ('counter', 'Audit batches that failed to write, by sink.', None),
+}
+
+
+class Registry:
+    """
+    Потокобезопасное хранилище метрик процесса.
+
+    Обновление — это захват блокировки и пара операций со словарем (единицы
+    микросекунд). Для агрегации между воркерами процесс периодически
+    сбрасывает снимок в `METRICS['MULTIPROCESS_DIR']`, а эндпоинт `/metrics`
+    суммирует снимки всех процессов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._counters = {}
+        self._histograms = {}
+        self._last_flush = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = DEFINITIONS[name][2]
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Счетчики корзин (последняя — +Inf), сумма и количество наблюдений
+                histogram = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            histogram[0][bisect_left(buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [
+                    [name, list(labels), list(counts), total, count]
+                    for (name, labels), (counts, total, count) in self._histograms.items()
+                ],
+            }
+
+    def maybe_flush(self):
+        directory = settings.METRICS['MULTIPROCESS_DIR']
+        if not directory:
+            return
+        now = time.monotonic()
+        if now - self._last_flush < settings.METRICS['FLUSH_INTERVAL']:
+            return
+        self._last_flush = now
+        self.flush(directory)
+
+    def flush(self, directory):
+        """
+        Атомарно записывает снимок метрик процесса в `directory`.
+        """
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+
+# Дочерний процесс (gunicorn --preload) не должен унаследовать счетчики родителя
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset)
+
+
+def collect():
+    """
+    Возвращает агрегированный снимок: по всем процессам, если задан
+    `METRICS['MULTIPROCESS_DIR']`, иначе только по текущему процессу.
+    """
+    directory = settings.METRICS['MULTIPROCESS_DIR']
+    if not directory:
+        return registry.snapshot()
+
+    registry.flush(directory)
+    counters = {}
+    histograms = {}
+    for filename in os.listdir(directory):
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+    return {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [
+            [name, list(labels), counts, total, count]
+            for (name, labels), (counts, total, count) in histograms.items()
+        ],
+    }
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def render(snapshot):
+    """
+    Форматирует снимок в текстовый формат Prometheus (version 0.0.4).
+    """
+    # Имя метрики -> список (метки, строки серии); серии сортируются по меткам
+    series = {}
+    for name, labels, value in snapshot['counters']:
+        series.setdefault(name, []).append((labels, [f'{name}{_format_labels(labels)} {value}']))
+    for name, labels, counts, total, count in snapshot['histograms']:
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(DEFINITIONS[name][2] + ('+Inf',), counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+        lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        series.setdefault(name, []).append((labels, lines))
+
+    output = []
+    for name, (kind, description, _) in DEFINITIONS.items():
+        output.append(f'# HELP {name} {description}')
+        output.append(f'# TYPE {name} {kind}')
+        for _, lines in sorted(series.get(name, ()), key=lambda item: [list(map(str, pair)) for pair in item[0]]):
+            output.extend(lines)
+    return '\n'.join(output) + '\n'
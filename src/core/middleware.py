@@ -0,0 +1,45 @@
+import time
+
+from django.db import connection
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """
+    Собирает метрики запроса: латентность по представлению, количество и
+    время SQL-запросов. Должен стоять первым в `MIDDLEWARE`, чтобы учитывать
+    время остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0, 0.0]
+
+        def track_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries[0] += 1
+                queries[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(track_query):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        # Имя маршрута, а не путь: кардинальность меток не зависит от id в URL
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.observe(
+            'auth_http_request_duration_seconds', duration,
+            view=view, method=request.method, status=response.status_code,
+        )
+        if queries[0]:
+            metrics.inc('auth_db_queries_total', queries[0], view=view)
+            metrics.inc('auth_db_query_duration_seconds_total', queries[1], view=view)
+        metrics.registry.maybe_flush()
+        return response
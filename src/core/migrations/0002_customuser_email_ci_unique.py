@@ -0,0 +1,42 @@
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def canonicalize_emails(apps, schema_editor):
+    """
+    Переводит существующие email в нижний регистр.
+    Если есть адреса, отличающиеся только регистром, миграция прерывается:
+    такие аккаунты нужно объединить или переименовать вручную.
+    """
+    CustomUser = apps.get_model('core', 'CustomUser')
+    collisions = list(
+        CustomUser.objects.annotate(email_lower=Lower('email'))
+        .values('email_lower')
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+        .values_list('email_lower', flat=True)
+    )
+    if collisions:
+        raise RuntimeError(
+            'Найдены пользователи с email, различающимися только регистром: '
+            + ', '.join(sorted(collisions))
+            + '. Объедините или переименуйте эти аккаунты и повторите миграцию.'
+        )
+    CustomUser.objects.exclude(email=Lower('email')).update(email=Lower('email'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalize_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='core_customuser_email_ci_unique'),
+        ),
+    ]
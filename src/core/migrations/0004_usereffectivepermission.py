@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_effective_permissions(apps, schema_editor):
+    CustomUser = apps.get_model('core', 'CustomUser')
+    UserEffectivePermission = apps.get_model('core', 'UserEffectivePermission')
+    rows = (
+        CustomUser.roles.through.objects.using(schema_editor.connection.alias)
+        .filter(role__permissions__isnull=False)
+        .values_list('customuser_id', 'role__permissions')
+        .distinct()
+        .iterator(chunk_size=10000)
+    )
+    batch = []
+    for user_id, permission_id in rows:
+        batch.append(UserEffectivePermission(user_id=user_id, permission_id=permission_id))
+        if len(batch) == 10000:
+            UserEffectivePermission.objects.using(schema_editor.connection.alias).bulk_create(batch)
+            batch = []
+    UserEffectivePermission.objects.using(schema_editor.connection.alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_customuser_role_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEffectivePermission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('permission', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='effective_users', to='core.permission', verbose_name='Разрешение')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='effective_permissions', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Эффективное разрешение',
+                'verbose_name_plural': 'Эффективные разрешения',
+                'indexes': [models.Index(fields=['permission', 'user'], name='core_uep_permission_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'permission'), name='core_uep_user_permission_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_effective_permissions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:04
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_usereffectivepermission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='Время')),
+                ('event', models.CharField(choices=[('login', 'Вход'), ('login_failed', 'Неудачный вход'), ('logout', 'Выход'), ('refresh', 'Обновление токена'), ('account_deactivated', 'Деактивация аккаунта'), ('role_changed', 'Изменение роли'), ('user_roles_changed', 'Изменение ролей пользователя'), ('permission_denied', 'Отказ в доступе')], max_length=32, verbose_name='Событие')),
+                ('user_id', models.BigIntegerField(blank=True, null=True, verbose_name='Пользователь')),
+                ('ip', models.CharField(blank=True, max_length=64, verbose_name='IP-адрес')),
+                ('details', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Подробности')),
+            ],
+            options={
+                'verbose_name': 'Событие аудита',
+                'verbose_name_plural': 'События аудита',
+                'indexes': [models.Index(fields=['user_id', 'created_at'], name='core_audit_user_created_idx'), models.Index(fields=['event', 'created_at'], name='core_audit_event_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:11
+
+import core.models
+import django.db.models.deletion
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import migrations, models
+
+
+def create_default_tenant(apps, schema_editor):
+    """
+    Арендатор по умолчанию с фиксированным id (как Site в django.contrib.sites):
+    на него ссылаются существующие строки и значение FK по умолчанию.
+    """
+    Tenant = apps.get_model('core', 'Tenant')
+    connection = schema_editor.connection
+    Tenant.objects.using(connection.alias).get_or_create(
+        pk=settings.TENANCY['DEFAULT_TENANT_ID'], defaults={'slug': 'default', 'name': 'Default'},
+    )
+    # Явный id не сдвигает последовательность PostgreSQL — сдвигаем сами
+    sequence_sql = connection.ops.sequence_reset_sql(no_style(), [Tenant])
+    if sequence_sql:
+        with connection.cursor() as cursor:
+            for sql in sequence_sql:
+                cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0005_auditevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tenant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(max_length=63, unique=True, verbose_name='Код')),
+                ('name', models.CharField(max_length=200, verbose_name='Название')),
+            ],
+            options={
+                'verbose_name': 'Арендатор',
+                'verbose_name_plural': 'Арендаторы',
+            },
+        ),
+        migrations.RunPython(create_default_tenant, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='permission',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='action',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Название действия'),
+        ),
+        migrations.AlterField(
+            model_name='resource',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Название ресурса'),
+        ),
+        migrations.AlterField(
+            model_name='role',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Название роли'),
+        ),
+        migrations.AddField(
+            model_name='action',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, default=core.models.default_tenant_id, on_delete=django.db.models.deletion.CASCADE, related_name='actions', to='core.tenant', verbose_name='Арендатор'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, default=core.models.default_tenant_id, on_delete=django.db.models.deletion.CASCADE, related_name='users', to='core.tenant', verbose_name='Арендатор'),
+        ),
+        migrations.AddField(
+            model_name='permission',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, default=core.models.default_tenant_id, on_delete=django.db.models.deletion.CASCADE, related_name='permissions', to='core.tenant', verbose_name='Арендатор'),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, default=core.models.default_tenant_id, on_delete=django.db.models.deletion.CASCADE, related_name='resources', to='core.tenant', verbose_name='Арендатор'),
+        ),
+        migrations.AddField(
+            model_name='role',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, default=core.models.default_tenant_id, on_delete=django.db.models.deletion.CASCADE, related_name='roles', to='core.tenant', verbose_name='Арендатор'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['tenant', 'id'], name='core_user_tenant_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='action',
+            constraint=models.UniqueConstraint(fields=('tenant', 'name'), name='core_action_tenant_name_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='permission',
+            constraint=models.UniqueConstraint(fields=('tenant', 'resource', 'action'), name='core_permission_tenant_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='resource',
+            constraint=models.UniqueConstraint(fields=('tenant', 'name'), name='core_resource_tenant_name_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='role',
+            constraint=models.UniqueConstraint(fields=('tenant', 'name'), name='core_role_tenant_name_unique'),
+        ),
+    ]
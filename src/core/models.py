@@ -1,13 +1,60 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 
+class Tenant(models.Model):
+    """
+    Организация-арендатор. Пользователи, роли, ресурсы, действия и
+    разрешения принадлежат ровно одному арендатору; имена уникальны в его
+    пределах. Арендатор по умолчанию (`TENANCY['DEFAULT_TENANT_ID']`)
+    создается миграцией — в него попадают данные однотенантных установок.
+    """
+    slug = models.SlugField(max_length=63, unique=True, verbose_name="Код")
+    name = models.CharField(max_length=200, verbose_name="Название")
+
+    def __str__(self):
+        return self.slug
+
+    class Meta:
+        verbose_name = "Арендатор"
+        verbose_name_plural = "Арендаторы"
+
+
+def default_tenant_id():
+    return settings.TENANCY['DEFAULT_TENANT_ID']
+
+
+def tenant_field(related_name):
+    # Отдельный индекс по FK не создаем: его покрывают составные индексы,
+    # начинающиеся с арендатора
+    return models.ForeignKey(
+        Tenant, on_delete=models.CASCADE, default=default_tenant_id, db_index=False,
+        related_name=related_name, verbose_name="Арендатор",
+    )
+
+
 class CustomUserManager(BaseUserManager):
     """
     Кастомный менеджер пользователей, где email является уникальным идентификатором
     для аутентификации вместо username.
     """
+    @classmethod
+    def normalize_email(cls, email):
+        """
+        Приводит email к каноническому виду: без пробелов по краям и целиком
+        в нижнем регистре (стандартная реализация понижает только домен).
+        Канонический email позволяет искать пользователя точным совпадением
+        по уникальному индексу, без регистронезависимых сканирований.
+        """
+        return super().normalize_email((email or '').strip()).lower()
+
+    def get_by_natural_key(self, email):
+        return self.get(**{self.model.USERNAME_FIELD: self.normalize_email(email)})
+
     def create_user(self, email, password=None, **extra_fields):
         """
         Создает и сохраняет пользователя с заданным email и паролем.
@@ -36,11 +83,17 @@ class CustomUserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 
+# Поля пользователя, от которых зависят выданные токены и кэшированные права
+SECURITY_FIELDS = ('tenant_id', 'is_active', 'is_superuser')
+
+
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     """
     Кастомная модель пользователя.
     """
+    # Email уникален глобально: вход не требует указывать арендатора
     email = models.EmailField('email address', unique=True)
+    tenant = tenant_field('users')
     first_name = models.CharField('first name', max_length=30, blank=True)
     last_name = models.CharField('last name', max_length=150, blank=True)
     is_staff = models.BooleanField(
@@ -54,6 +107,8 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         help_text='Определяет, следует ли считать этого пользователя активным.',
     )
     date_joined = models.DateTimeField('date joined', default=timezone.now)
+    # Версия представления для ETag профиля (см. core/caching.py)
+    updated_at = models.DateTimeField('updated at', auto_now=True)
 
     objects = CustomUserManager()
 
@@ -63,17 +118,50 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = 'user'
         verbose_name_plural = 'users'
+        constraints = [
+            # Страховка от дублей, различающихся только регистром,
+            # если email был записан в обход normalize_email
+            models.UniqueConstraint(Lower('email'), name='core_customuser_email_ci_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['tenant', 'id'], name='core_user_tenant_id_idx'),
+        ]
 
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._remember_saved_values()
+        return user
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Сигналы post_save уже сравнили новые значения с прежними
+        self._remember_saved_values(kwargs.get('update_fields'))
+
+    def _remember_saved_values(self, update_fields=None):
+        """
+        Запоминает значения полей `SECURITY_FIELDS` в БД: их изменение
+        отзывает токены и сбрасывает кэши прав пользователя (см. signals.py).
+        """
+        saved = self.__dict__.setdefault('_saved_values', {})
+        for name in SECURITY_FIELDS:
+            if name not in self.__dict__:
+                # Отложенное поле (.only()/.defer())
+                continue
+            if update_fields is None or {name, name.removesuffix('_id')} & set(update_fields):
+                saved[name] = self.__dict__[name]
+
 
 class Resource(models.Model):
     """
     Модель, представляющая ресурс, к которому запрашивается доступ.
     Например, "Документы", "Отчеты" и т.д.
     """
-    name = models.CharField(max_length=100, unique=True, verbose_name="Название ресурса")
+    tenant = tenant_field('resources')
+    name = models.CharField(max_length=100, verbose_name="Название ресурса")
 
     def __str__(self):
         return self.name
@@ -81,6 +169,9 @@ class Resource(models.Model):
     class Meta:
         verbose_name = "Ресурс"
         verbose_name_plural = "Ресурсы"
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'name'], name='core_resource_tenant_name_unique'),
+        ]
 
 
 class Action(models.Model):
@@ -88,7 +179,8 @@ class Action(models.Model):
     Модель, представляющая действие, которое можно выполнить над ресурсом.
     Например, "читать", "создавать", "редактировать", "удалять".
     """
-    name = models.CharField(max_length=100, unique=True, verbose_name="Название действия")
+    tenant = tenant_field('actions')
+    name = models.CharField(max_length=100, verbose_name="Название действия")
 
     def __str__(self):
         return self.name
@@ -96,6 +188,9 @@ class Action(models.Model):
     class Meta:
         verbose_name = "Действие"
         verbose_name_plural = "Действия"
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'name'], name='core_action_tenant_name_unique'),
+        ]
 
 
 class Permission(models.Model):
@@ -103,16 +198,25 @@ class Permission(models.Model):
     Модель, объединяющая ресурс и действие, формируя конкретное право доступа.
     Например, "читать Документы".
     """
+    # Дублирует арендатора ресурса, чтобы справочник арендатора читался по индексу без соединений
+    tenant = tenant_field('permissions')
     resource = models.ForeignKey(Resource, on_delete=models.CASCADE, verbose_name="Ресурс")
     action = models.ForeignKey(Action, on_delete=models.CASCADE, verbose_name="Действие")
 
     def __str__(self):
         return f'{self.action.name} {self.resource.name}'
 
+    def save(self, *args, **kwargs):
+        self.tenant_id = self.resource.tenant_id
+        super().save(*args, **kwargs)
+
     class Meta:
-        unique_together = ('resource', 'action')
         verbose_name = "Разрешение"
         verbose_name_plural = "Разрешения"
+        constraints = [
+            # Ресурс определяет арендатора, так что это прежняя уникальность (resource, action)
+            models.UniqueConstraint(fields=['tenant', 'resource', 'action'], name='core_permission_tenant_unique'),
+        ]
 
 
 class Role(models.Model):
@@ -120,8 +224,11 @@ class Role(models.Model):
     Модель роли, которая является набором разрешений.
     Роли присваиваются пользователям.
     """
-    name = models.CharField(max_length=100, unique=True, verbose_name="Название роли")
+    tenant = tenant_field('roles')
+    name = models.CharField(max_length=100, verbose_name="Название роли")
     permissions = models.ManyToManyField(Permission, verbose_name="Разрешения")
+    # Версия для ETag роли (см. core/caching.py)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменена")
 
     def __str__(self):
         return self.name
@@ -129,7 +236,90 @@ class Role(models.Model):
     class Meta:
         verbose_name = "Роль"
         verbose_name_plural = "Роли"
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'name'], name='core_role_tenant_name_unique'),
+        ]
 
 
 # Добавляем связь Many-to-Many к кастомной модели пользователя
-CustomUser.add_to_class('roles', models.ManyToManyField(Role, verbose_name="Роли", blank=True))
\ No newline at end of file
+CustomUser.add_to_class('roles', models.ManyToManyField(Role, verbose_name="Роли", blank=True))
+
+
+class UserEffectivePermission(models.Model):
+    """
+    Денормализованная связь "пользователь — разрешение": по строке на каждое
+    разрешение, которое пользователь получает хотя бы через одну роль.
+
+    Заменяет соединение пяти таблиц в запросах вида "все пользователи,
+    которые могут выполнить A над R". Поддерживается сигналами при изменении
+    ролей пользователей, разрешений ролей и удалении ролей (см. signals.py);
+    команда `refresh_effective_permissions` пересчитывает ее целиком.
+    """
+    # Одиночные индексы по FK не нужны: их покрывают составные ниже
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, db_index=False,
+        related_name='effective_permissions', verbose_name="Пользователь",
+    )
+    permission = models.ForeignKey(
+        Permission, on_delete=models.CASCADE, db_index=False,
+        related_name='effective_users', verbose_name="Разрешение",
+    )
+
+    def __str__(self):
+        return f'{self.user_id}: {self.permission_id}'
+
+    class Meta:
+        verbose_name = "Эффективное разрешение"
+        verbose_name_plural = "Эффективные разрешения"
+        constraints = [
+            # Уникальность и индекс (user, permission) — права пользователя
+            models.UniqueConstraint(fields=['user', 'permission'], name='core_uep_user_permission_unique'),
+        ]
+        indexes = [
+            # Обратный поиск: пользователи с разрешением, по порядку id (курсорная пагинация)
+            models.Index(fields=['permission', 'user'], name='core_uep_permission_user_idx'),
+        ]
+
+
+class AuditEvent(models.Model):
+    """
+    Событие журнала аудита. Записи создаются пакетами фоновым потоком
+    (см. core/audit.py), поэтому время события задается явно, а не auto_now_add.
+    """
+    LOGIN = 'login'
+    LOGIN_FAILED = 'login_failed'
+    LOGOUT = 'logout'
+    REFRESH = 'refresh'
+    ACCOUNT_DEACTIVATED = 'account_deactivated'
+    ROLE_CHANGED = 'role_changed'
+    USER_ROLES_CHANGED = 'user_roles_changed'
+    PERMISSION_DENIED = 'permission_denied'
+    EVENT_CHOICES = [
+        (LOGIN, 'Вход'),
+        (LOGIN_FAILED, 'Неудачный вход'),
+        (LOGOUT, 'Выход'),
+        (REFRESH, 'Обновление токена'),
+        (ACCOUNT_DEACTIVATED, 'Деактивация аккаунта'),
+        (ROLE_CHANGED, 'Изменение роли'),
+        (USER_ROLES_CHANGED, 'Изменение ролей пользователя'),
+        (PERMISSION_DENIED, 'Отказ в доступе'),
+    ]
+
+    created_at = models.DateTimeField(verbose_name="Время")
+    event = models.CharField(max_length=32, choices=EVENT_CHOICES, verbose_name="Событие")
+    # Не FK: запись переживает удаление пользователя, а вставка не проверяет ссылку
+    user_id = models.BigIntegerField(null=True, blank=True, verbose_name="Пользователь")
+    ip = models.CharField(max_length=64, blank=True, verbose_name="IP-адрес")
+    details = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder, verbose_name="Подробности")
+
+    def __str__(self):
+        return f'{self.created_at:%Y-%m-%d %H:%M:%S} {self.event} {self.user_id}'
+
+    class Meta:
+        verbose_name = "Событие аудита"
+        verbose_name_plural = "События аудита"
+        indexes = [
+            # История пользователя и выборка событий одного типа за период
+            models.Index(fields=['user_id', 'created_at'], name='core_audit_user_created_idx'),
+            models.Index(fields=['event', 'created_at'], name='core_audit_event_created_idx'),
+        ]
@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация по возрастанию id.
+
+    В отличие от LIMIT/OFFSET, стоимость страницы не растет с ее номером
+    (`WHERE id > <курсор> ORDER BY id LIMIT n` идет по индексу) и не требует
+    COUNT(*) по всей выборке; выдача стабильна при вставках между запросами.
+    """
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
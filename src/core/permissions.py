@@ -1,5 +1,13 @@
+import hmac
+
+from django.conf import settings
 from rest_framework.permissions import BasePermission
 
+from . import audit, metrics
+from .models import AuditEvent
+from .rbac import get_cached_permissions, get_effective_permissions
+from .tracing import tracer
+
 
 class IsSuperUser(BasePermission):
     """
@@ -10,6 +18,20 @@ class IsSuperUser(BasePermission):
         return request.user and request.user.is_superuser
 
 
+class HasMetricsToken(BasePermission):
+    """
+    Доступ к `/metrics` по статическому токену из `METRICS['TOKEN']`
+    (заголовок `Authorization: Bearer <token>`). Если токен не задан,
+    эндпоинт открыт — предполагается, что он доступен только из внутренней сети.
+    """
+
+    def has_permission(self, request, view):
+        token = settings.METRICS['TOKEN']
+        if not token:
+            return True
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
 class HasPermission(BasePermission):
     """
     Кастомное право доступа для проверки, имеет ли пользователь необходимое разрешение.
@@ -18,28 +40,54 @@ class HasPermission(BasePermission):
     def has_permission(self, request, view):
         # Получаем необходимое разрешение из атрибутов представления
         required_permission_str = getattr(view, 'required_permission', None)
+        if settings.AUTHZ_TRACING['ENABLED']:
+            granted, details = tracer.trace(request, view, required_permission_str, self.check)
+        else:
+            granted, details = self.check(request, required_permission_str)
+        if not granted and details['reason'] == 'unauthenticated':
+            # Анонимные 401 ничем не ограничены: в очередь аудита они не идут,
+            # иначе могли бы заполнить ее и тормозить запись остальных событий
+            metrics.inc('auth_audit_events_total', event=AuditEvent.PERMISSION_DENIED, result='skipped')
+        elif not granted:
+            audit.record(
+                AuditEvent.PERMISSION_DENIED, request,
+                view=type(view).__name__, required_permission=required_permission_str, reason=details['reason'],
+            )
+        return granted
+
+    def check(self, request, required_permission_str, use_cache=True):
+        """
+        Принимает решение и возвращает `(granted, details)`, где `details`
+        описывает причину решения, роли пользователя и обращение к кэшу.
+        """
         if not required_permission_str:
             # Если в представлении не указано required_permission, доступ запрещен
-            return False
+            return False, {'reason': 'no_required_permission'}
 
         try:
             action_name, resource_name = required_permission_str.split(' ', 1)
         except ValueError:
             # Неверный формат required_permission
-            return False
+            return False, {'reason': 'invalid_required_permission'}
 
         # Проверяем, аутентифицирован ли пользователь
         if not request.user or not request.user.is_authenticated:
-            return False
+            return False, {'reason': 'unauthenticated'}
 
         # Суперпользователь имеет доступ ко всему
         if request.user.is_superuser:
-            return True
+            return True, {'reason': 'superuser'}
 
         # Проверяем наличие права у пользователя через его роли
-        user_roles = request.user.roles.all()
-        for role in user_roles:
-            if role.permissions.filter(action__name=action_name, resource__name=resource_name).exists():
-                return True
-
-        return False
+        if use_cache:
+            roles, permissions, cache_hit = get_cached_permissions(request.user)
+        else:
+            roles, permissions = get_effective_permissions(request.user)
+            cache_hit = None
+        details = {
+            'roles': roles,
+            'cache': {True: 'hit', False: 'miss', None: 'bypass'}[cache_hit],
+        }
+        if f'{action_name} {resource_name}' in permissions:
+            return True, dict(details, reason='role_permission')
+        return False, dict(details, reason='missing_permission')
@@ -0,0 +1,49 @@
+import functools
+import hashlib
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def build_schema():
+    """
+    Генерирует схему OpenAPI через drf_yasg и возвращает компактный JSON (bytes).
+
+    Генератор обходит все представления и сериализаторы, поэтому вызывается
+    при сборке образа (`build_openapi_schema`), а не на каждый запрос.
+    drf_yasg импортируется здесь, чтобы не загружать его при старте процесса.
+    """
+    from drf_yasg.app_settings import swagger_settings
+    from drf_yasg.codecs import OpenAPICodecJson
+    from auth_service.openapi import api_info
+
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(info=api_info)
+    schema = generator.get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[], pretty=False).encode(schema)
+
+
+@functools.lru_cache(maxsize=None)
+def get_schema_document():
+    """
+    Возвращает `(body, etag)` схемы OpenAPI.
+
+    Документ читается из `OPENAPI_SCHEMA_FILE` один раз на процесс и больше
+    не перечитывается: схема меняется только вместе с кодом, то есть при
+    деплое (перезапуске процесса). Если файл не собран (локальная
+    разработка), схема генерируется в процессе — тоже один раз.
+    """
+    try:
+        with open(settings.OPENAPI_SCHEMA_FILE, 'rb') as f:
+            body = f.read()
+    except FileNotFoundError:
+        body = None
+    if body is None:
+        logger.warning(
+            'OpenAPI schema file %s not found, generating the schema in-process. '
+            'Run "manage.py build_openapi_schema" at build time.',
+            settings.OPENAPI_SCHEMA_FILE,
+        )
+        body = build_schema()
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
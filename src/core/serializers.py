@@ -1,31 +1,68 @@
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import CustomUser, Role, Permission, Resource, Action
+from .rbac import get_role_id, refresh_effective_permissions
+from .tenancy import CurrentTenantDefault, request_tenant_id
+
+logger = logging.getLogger(__name__)
+
+
+class CanonicalEmailField(serializers.EmailField):
+    """
+    Email-поле, приводящее адрес к каноническому виду до запуска валидаторов.
+    """
+    def to_internal_value(self, data):
+        return CustomUser.objects.normalize_email(super().to_internal_value(data))
 
 
 class RegisterSerializer(serializers.ModelSerializer):
     """
     Сериализатор для регистрации нового пользователя.
     """
+    # Без UniqueValidator: уникальность email проверяет сама вставка,
+    # чтобы не делать лишний SELECT перед INSERT
+    email = CanonicalEmailField(max_length=254)
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
 
     class Meta:
         model = CustomUser
         fields = ('email', 'password', 'first_name', 'last_name')
 
+    def get_default_role_name(self, email):
+        domain = email.rsplit('@', 1)[-1].lower()
+        registration = settings.REGISTRATION
+        return registration['ROLES_BY_EMAIL_DOMAIN'].get(domain, registration['DEFAULT_ROLE'])
+
     def create(self, validated_data):
-        user = CustomUser.objects.create_user(
+        user = CustomUser(
             email=validated_data['email'],
-            password=validated_data['password'],
             first_name=validated_data.get('first_name', ''),
-            last_name=validated_data.get('last_name', '')
+            last_name=validated_data.get('last_name', ''),
         )
+        # Хэшируем пароль до открытия транзакции, чтобы не держать ее во время PBKDF2
+        user.set_password(validated_data['password'])
+
+        role_name = self.get_default_role_name(user.email)
+        # Саморегистрация — в арендатора по умолчанию (поле модели по умолчанию)
+        role_id = get_role_id(user.tenant_id, role_name)
+        if role_id is None:
+            logger.error("Default role '%s' does not exist, user %s is created without roles", role_name, user.email)
+
         try:
-            user_role = Role.objects.get(name='User')
-            user.roles.add(user_role)
-        except Role.DoesNotExist:
-            # В идеале, здесь нужно логировать ошибку,
-            # так как роль 'User' должна всегда существовать.
-            pass
+            with transaction.atomic():
+                user.save(force_insert=True)
+                if role_id is not None:
+                    # Прямая вставка в промежуточную таблицу: без SELECT существующих связей
+                    CustomUser.roles.through.objects.create(customuser_id=user.pk, role_id=role_id)
+                    # Сигналы m2m_changed при этом не срабатывают: разрешения роли — одним INSERT ... SELECT
+                    refresh_effective_permissions(users=[user.pk], revoke=False)
+        except IntegrityError:
+            raise serializers.ValidationError({'email': ['Пользователь с таким email уже существует.']})
         return user
 
 
@@ -33,21 +70,60 @@ class UserSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели пользователя.
     """
+    email = CanonicalEmailField(
+        max_length=254,
+        validators=[UniqueValidator(queryset=CustomUser.objects.all())],
+    )
     roles = serializers.StringRelatedField(many=True)
 
     class Meta:
         model = CustomUser
         fields = ('id', 'email', 'first_name', 'last_name', 'roles')
 
+    def to_representation(self, instance):
+        # Быстрый путь чтения (профиль): то же, что дают поля из Meta,
+        # но без построения и обхода полей DRF
+        return {
+            'id': instance.pk,
+            'email': instance.email,
+            'first_name': instance.first_name,
+            'last_name': instance.last_name,
+            'roles': [str(role) for role in instance.roles.all()],
+        }
+
+
+class TenantTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Пара токенов с claim арендатора пользователя (`TENANCY['TOKEN_CLAIM']`).
+    Access-токены, выпускаемые по refresh-токену, наследуют claim.
+    """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[settings.TENANCY['TOKEN_CLAIM']] = user.tenant_id
+        return token
+
 
 class RoleSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели роли.
     """
+    tenant = serializers.HiddenField(default=CurrentTenantDefault())
+
     class Meta:
         model = Role
         fields = '__all__'
 
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is not None:
+            # Назначить роли можно только разрешения ее арендатора
+            fields['permissions'].child_relation.queryset = Permission.objects.filter(
+                tenant_id=request_tenant_id(request)
+            )
+        return fields
+
 
 class PermissionSerializer(serializers.ModelSerializer):
     """
@@ -60,11 +136,21 @@ class PermissionSerializer(serializers.ModelSerializer):
         model = Permission
         fields = ('id', 'resource', 'action')
 
+    def to_representation(self, instance):
+        # Быстрый путь чтения (справочник разрешений), см. UserSerializer
+        return {
+            'id': instance.pk,
+            'resource': str(instance.resource),
+            'action': str(instance.action),
+        }
+
 
 class ResourceSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели ресурса.
     """
+    tenant = serializers.HiddenField(default=CurrentTenantDefault())
+
     class Meta:
         model = Resource
         fields = '__all__'
@@ -74,6 +160,37 @@ class ActionSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели действия.
     """
+    tenant = serializers.HiddenField(default=CurrentTenantDefault())
+
     class Meta:
         model = Action
         fields = '__all__'
+
+
+class PermissionUserSerializer(serializers.ModelSerializer):
+    """
+    Краткое представление пользователя в обратном поиске по разрешению.
+    """
+    class Meta:
+        model = CustomUser
+        fields = ('id', 'email', 'is_active')
+
+
+class TokenIntrospectionSerializer(serializers.Serializer):
+    """
+    Сериализатор запроса интроспекции токенов (RFC 7662).
+    Принимает либо один токен в `token`, либо пакет токенов в `tokens`.
+    """
+    token = serializers.CharField(required=False)
+    token_type_hint = serializers.CharField(required=False)
+    tokens = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        allow_empty=False,
+        max_length=settings.TOKEN_INTROSPECTION['MAX_BATCH_SIZE'],
+    )
+
+    def validate(self, attrs):
+        if ('token' in attrs) == ('tokens' in attrs):
+            raise serializers.ValidationError("Укажите либо 'token', либо 'tokens'.")
+        return attrs
@@ -0,0 +1,159 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from . import audit
+from .introspection import revoke_jti, revoke_user_tokens
+from .models import Action, AuditEvent, CustomUser, Permission, Resource, Role
+from .rbac import bump_rbac_version, bump_user_rbac_version, refresh_effective_permissions
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def revoke_blacklisted_token(sender, instance, **kwargs):
+    """
+    Токен попал в черный список (logout, ротация, деактивация) —
+    сбрасываем его закэшированный результат интроспекции.
+    """
+    revoke_jti(instance.token.jti, instance.token.expires_at)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+@receiver(post_save, sender=Action)
+@receiver(post_delete, sender=Action)
+def invalidate_rbac_on_change(sender, instance, **kwargs):
+    bump_rbac_version(instance.tenant_id)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def invalidate_rbac_on_role_permissions_change(sender, instance, action, **kwargs):
+    # Роль и разрешения одного арендатора: и role.permissions, и permission.role_set
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_rbac_version(instance.tenant_id)
+
+
+@receiver(m2m_changed, sender=CustomUser.roles.through)
+def invalidate_rbac_on_user_roles_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        bump_user_rbac_version([instance.pk])
+    elif pk_set:
+        bump_user_rbac_version(pk_set)
+    else:
+        # role.customuser_set.clear(): затронутые пользователи неизвестны
+        bump_rbac_version(instance.tenant_id)
+
+
+def _changed_security_fields(instance, created, update_fields):
+    """
+    Поля `SECURITY_FIELDS`, которые этот save() изменил в БД.
+    """
+    if created:
+        return set()
+    saved = instance.__dict__.get('_saved_values', {})
+    return {
+        name for name, value in saved.items()
+        if getattr(instance, name) != value
+        and (update_fields is None or {name, name.removesuffix('_id')} & set(update_fields))
+    }
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_on_tenant_change(sender, instance, created, update_fields, **kwargs):
+    """
+    Пользователь перенесен к другому арендатору. Записи кэша прав хранятся
+    по id пользователя, а в токенах и закэшированной интроспекции остался
+    старый арендатор, поэтому сбрасываем версию ролей пользователя и
+    отзываем его токены, а эффективные разрешения пересчитываем: роли
+    старого арендатора больше ничего не дают.
+    """
+    if 'tenant_id' not in _changed_security_fields(instance, created, update_fields):
+        return
+    bump_user_rbac_version([instance.pk])
+    revoke_user_tokens(instance)
+    refresh_effective_permissions(users=[instance.pk])
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_on_access_change(sender, instance, created, update_fields, **kwargs):
+    """
+    Пользователь деактивирован (активирован) или изменен флаг суперпользователя
+    в обход API — через админку или ORM. Закэшированная интроспекция
+    проверяет только черный список, "водяной знак" и версии RBAC, поэтому
+    отзываем токены и сбрасываем версию ролей пользователя.
+    """
+    if not {'is_active', 'is_superuser'} & _changed_security_fields(instance, created, update_fields):
+        return
+    bump_user_rbac_version([instance.pk])
+    revoke_user_tokens(instance)
+
+
+# Синхронизация UserEffectivePermission. Удаление пользователя, разрешения,
+# ресурса или действия каскадно удаляет строки через FK; здесь — изменения,
+# которые каскад не покрывает.
+
+@receiver(m2m_changed, sender=CustomUser.roles.through)
+def sync_effective_permissions_on_user_roles_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # role.customuser_set.clear(): после очистки затронутых пользователей уже не найти
+        instance._cleared_user_ids = list(instance.customuser_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        users = [instance.pk]
+    elif action == 'post_clear':
+        users = instance.__dict__.pop('_cleared_user_ids', [])
+    else:
+        users = pk_set
+    if users:
+        added = action == 'post_add'
+        refresh_effective_permissions(users=users, grant=added, revoke=not added)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def sync_effective_permissions_on_role_permissions_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        roles, permissions = [instance.pk], (None if action == 'post_clear' else pk_set)
+    else:
+        # permission.role_set.<...>: затронуто одно разрешение — то, у которого меняются роли
+        roles, permissions = (None if action == 'post_clear' else pk_set), [instance.pk]
+    if action != 'post_clear' and not pk_set:
+        return
+    users = None if roles is None else CustomUser.objects.filter(roles__in=roles).values('pk')
+    added = action == 'post_add'
+    refresh_effective_permissions(users=users, permissions=permissions, grant=added, revoke=not added)
+
+
+@receiver(pre_delete, sender=Role)
+def remember_role_users(sender, instance, **kwargs):
+    instance._deleted_user_ids = list(instance.customuser_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Role)
+def sync_effective_permissions_on_role_delete(sender, instance, **kwargs):
+    users = instance.__dict__.pop('_deleted_user_ids', None)
+    if users:
+        refresh_effective_permissions(users=users, grant=False)
+
+
+@receiver(m2m_changed, sender=CustomUser.roles.through)
+def audit_user_roles_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    operation = action[len('post_'):]
+    if not reverse:
+        audit.record(AuditEvent.USER_ROLES_CHANGED, user_id=instance.pk, operation=operation, roles=sorted(pk_set or ()))
+    elif pk_set:
+        for user_id in sorted(pk_set):
+            audit.record(AuditEvent.USER_ROLES_CHANGED, user_id=user_id, operation=operation, roles=[instance.pk])
+    else:
+        # role.customuser_set.clear(): затронутые пользователи неизвестны
+        audit.record(AuditEvent.USER_ROLES_CHANGED, operation=operation, roles=[instance.pk])
@@ -0,0 +1,39 @@
+from .models import Tenant
+
+
+def request_tenant_id(request):
+    """
+    Арендатор запроса — арендатор аутентифицированного пользователя. Claim
+    токена сверяется с ним при аутентификации (см. authentication.py).
+    """
+    return request.user.tenant_id
+
+
+class CurrentTenantDefault:
+    """
+    Значение по умолчанию для скрытого поля `tenant` сериализаторов
+    (по аналогии с `CurrentUserDefault`): арендатор пользователя запроса.
+    Клиент не может указать чужого арендатора, а валидатор уникальности
+    (tenant, name) работает как обычно.
+    """
+    requires_context = True
+
+    def __call__(self, serializer_field):
+        # Ссылка по id: запрос к таблице арендаторов не нужен
+        return Tenant(pk=request_tenant_id(serializer_field.context['request']))
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}()'
+
+
+class TenantScopedViewSetMixin:
+    """
+    Ограничивает queryset представления арендатором пользователя: объекты
+    других арендаторов не видны ни в списке, ни по id (404).
+    """
+
+    def get_queryset(self):
+        # drf_yasg строит схему без пользователя (request=None или AnonymousUser)
+        if getattr(self, 'swagger_fake_view', False):
+            return super().get_queryset().none()
+        return super().get_queryset().filter(tenant_id=request_tenant_id(self.request))
@@ -1,7 +1,47 @@
+import datetime
+import decimal
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ModelSerializer
 from rest_framework.test import APITestCase
-from .models import CustomUser, Role, Permission, Resource, Action
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .models import AuditEvent, CustomUser, Role, Permission, Resource, Action, Tenant, UserEffectivePermission
+from . import metrics, rbac
+from .audit import AuditLog, audit
+from .health import readiness, wait_for_database
+from .introspection import introspect_tokens
+from .management.commands.prepare_db import disk_migrations
+from .schema import get_schema_document
+from .parsers import FastJSONParser
+from .rbac import (
+    bump_rbac_version, get_cached_permissions, get_rbac_version, rbac_version_key, refresh_effective_permissions,
+    users_with_permission,
+)
+from .renderers import FastJSONRenderer
+from .serializers import PermissionSerializer, RegisterSerializer, TenantTokenObtainPairSerializer, UserSerializer
+from .tracing import tracer
+from .throttling import SlidingWindowRateThrottle, LoginRateThrottle
 
 class AuthTests(APITestCase):
     """
@@ -9,6 +49,7 @@ class AuthTests(APITestCase):
     """
 
     def setUp(self):
+        cache.clear()
         # URLs
         self.register_url = reverse('auth_register')
         self.login_url = reverse('token_obtain_pair')
@@ -129,6 +170,7 @@ class PermissionsTests(APITestCase):
     """
 
     def setUp(self):
+        cache.clear()
         # URLs
         self.secret_url = reverse('secret_document')
         self.login_url = reverse('token_obtain_pair')
@@ -203,6 +245,7 @@ class AdminAPITests(APITestCase):
     Тесты для API администрирования ролей.
     """
     def setUp(self):
+        cache.clear()
         self.roles_url = reverse('role-list')
         self.login_url = reverse('token_obtain_pair')
 
@@ -233,4 +276,1231 @@ class AdminAPITests(APITestCase):
         role_data = {'name': 'New Role'}
         response = self.client.post(self.roles_url, role_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertTrue(Role.objects.filter(name='New Role').exists())
\ No newline at end of file
+        self.assertTrue(Role.objects.filter(name='New Role').exists())
+
+
+class IntrospectionTests(APITestCase):
+    """
+    Тесты для эндпоинта интроспекции токенов.
+    """
+    def setUp(self):
+        cache.clear()
+        self.introspect_url = reverse('token_introspect')
+        self.logout_url = reverse('auth_logout')
+
+        resource = Resource.objects.create(name='Token')
+        action = Action.objects.create(name='introspect')
+        gateway_role = Role.objects.create(name='Gateway')
+        gateway_role.permissions.add(Permission.objects.create(resource=resource, action=action))
+        self.gateway = CustomUser.objects.create_user(email='gateway@example.com', password='password')
+        self.gateway.roles.add(gateway_role)
+
+        self.viewer_role = Role.objects.create(name='Viewer')
+        self.viewer_role.permissions.add(Permission.objects.create(
+            resource=Resource.objects.create(name='SecretDocument'),
+            action=Action.objects.create(name='read'),
+        ))
+        self.user = CustomUser.objects.create_user(email='user@example.com', password='password')
+        self.user.roles.add(self.viewer_role)
+        self.refresh = RefreshToken.for_user(self.user)
+
+        gateway_token = RefreshToken.for_user(self.gateway).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {gateway_token}')
+
+    def introspect(self, token):
+        return self.client.post(self.introspect_url, {'token': str(token)}, format='json')
+
+    def test_active_token_returns_roles_and_permissions(self):
+        response = self.introspect(self.refresh.access_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['active'])
+        self.assertEqual(response.data['sub'], str(self.user.id))
+        self.assertEqual(response.data['roles'], ['Viewer'])
+        self.assertEqual(response.data['permissions'], ['read SecretDocument'])
+
+    def test_invalid_token_is_inactive(self):
+        response = self.introspect('not-a-token')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'active': False})
+
+    def test_cached_result_skips_database(self):
+        access = self.refresh.access_token
+        self.introspect(access)
+        with self.assertNumQueries(0):
+            self.assertTrue(introspect_tokens([str(access)])[0]['active'])
+
+    def test_blacklisted_refresh_token_becomes_inactive(self):
+        self.assertTrue(self.introspect(self.refresh).data['active'])
+        self.refresh.blacklist()
+        self.assertFalse(self.introspect(self.refresh).data['active'])
+
+    def test_deactivation_revokes_access_tokens(self):
+        access = self.refresh.access_token
+        self.assertTrue(self.introspect(access).data['active'])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.client.delete(reverse('auth_profile'))
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.gateway).access_token}'
+        )
+        self.assertFalse(self.introspect(access).data['active'])
+
+    def test_deactivation_through_orm_revokes_cached_tokens(self):
+        self.assertTrue(self.introspect(self.refresh).data['active'])
+        # Сохранение без изменения флагов доступа токены не трогает
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.assertTrue(self.introspect(self.refresh).data['active'])
+
+        # Как в админке: пользователь загружен из БД и сохранен целиком
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertFalse(self.introspect(self.refresh).data['active'])
+
+    def test_superuser_flag_change_revokes_cached_tokens(self):
+        access = self.refresh.access_token
+        self.assertTrue(self.introspect(access).data['active'])
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertFalse(self.introspect(access).data['active'])
+
+    def test_role_change_refreshes_cached_permissions(self):
+        access = self.refresh.access_token
+        self.assertEqual(self.introspect(access).data['permissions'], ['read SecretDocument'])
+        self.user.roles.remove(self.viewer_role)
+        self.assertEqual(self.introspect(access).data['permissions'], [])
+
+    def test_batch_introspection(self):
+        response = self.client.post(
+            self.introspect_url,
+            {'tokens': [str(self.refresh.access_token), 'garbage']},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['results'][0]['active'])
+        self.assertFalse(response.data['results'][1]['active'])
+
+    def test_introspection_requires_permission(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+        response = self.introspect(self.refresh.access_token)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ThrottlingTests(APITestCase):
+    """
+    Тесты ограничения частоты попыток входа, регистрации и обновления токена.
+    """
+    rates = {
+        'login': '5/min',
+        'login_account': '3/min',
+        'register': '2/min',
+        'register_account': '2/min',
+        'refresh': '2/min',
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.login_url = reverse('token_obtain_pair')
+        self.register_url = reverse('auth_register')
+        self.refresh_url = reverse('token_refresh')
+        CustomUser.objects.create_user(email='user@example.com', password='password')
+        patcher = mock.patch.object(SlidingWindowRateThrottle, 'THROTTLE_RATES', self.rates)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Начало окна: граница минуты посреди теста не должна сбрасывать счетчики
+        patcher = mock.patch.object(SlidingWindowRateThrottle, 'timer', staticmethod(lambda: 6000.0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_account_throttle_rejects_before_hashing(self):
+        login_data = {'email': 'user@example.com', 'password': 'wrong'}
+        for _ in range(3):
+            response = self.client.post(self.login_url, login_data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with mock.patch.object(
+            PBKDF2PasswordHasher, 'encode', autospec=True, side_effect=PBKDF2PasswordHasher.encode
+        ) as encode:
+            response = self.client.post(self.login_url, login_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        encode.assert_not_called()
+
+    def test_account_throttle_ignores_email_case(self):
+        for email in ('user@example.com', 'USER@example.com', 'User@Example.com'):
+            self.client.post(self.login_url, {'email': email, 'password': 'wrong'}, format='json')
+        response = self.client.post(
+            self.login_url, {'email': 'user@example.com', 'password': 'wrong'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_ip_throttle_across_accounts(self):
+        for i in range(5):
+            self.client.post(self.login_url, {'email': f'u{i}@example.com', 'password': 'x'}, format='json')
+        response = self.client.post(self.login_url, {'email': 'other@example.com', 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_register_and_refresh_are_throttled(self):
+        for i in range(2):
+            self.client.post(self.register_url, {'email': f'new{i}@example.com', 'password': 'pass12345'}, format='json')
+        response = self.client.post(self.register_url, {'email': 'new9@example.com', 'password': 'pass12345'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        for _ in range(2):
+            self.client.post(self.refresh_url, {'refresh': 'garbage'}, format='json')
+        response = self.client.post(self.refresh_url, {'refresh': 'garbage'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_sliding_window_weights_previous_window(self):
+        request = mock.Mock(headers={}, META={'REMOTE_ADDR': '10.0.0.1'})
+        clock = mock.Mock(return_value=59.0)
+
+        def attempt():
+            throttle = LoginRateThrottle()
+            throttle.timer = clock
+            return throttle.allow_request(request, None)
+
+        self.assertEqual(sum(attempt() for _ in range(6)), 5)
+        # Середина следующего окна: предыдущее окно учитывается наполовину
+        clock.return_value = 90.0
+        self.assertEqual(sum(attempt() for _ in range(5)), 3)
+
+
+class RegistrationTests(APITestCase):
+    """
+    Тесты быстрого пути регистрации.
+    """
+    def setUp(self):
+        cache.clear()
+        self.register_url = reverse('auth_register')
+        self.user_role = Role.objects.create(name='User')
+        self.partner_role = Role.objects.create(name='Partner')
+        self.data = {'email': 'new@example.com', 'password': 'testpassword123'}
+
+    def test_registration_assigns_default_role(self):
+        response = self.client.post(self.register_url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = CustomUser.objects.get(email='new@example.com')
+        self.assertEqual(list(user.roles.all()), [self.user_role])
+
+    @override_settings(REGISTRATION={'DEFAULT_ROLE': 'User', 'ROLES_BY_EMAIL_DOMAIN': {'partner.com': 'Partner'}})
+    def test_registration_role_by_email_domain(self):
+        data = {'email': 'someone@Partner.com', 'password': 'testpassword123'}
+        response = self.client.post(self.register_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = CustomUser.objects.get(email='someone@partner.com')
+        self.assertEqual(list(user.roles.all()), [self.partner_role])
+
+    def test_duplicate_email_is_rejected_without_prior_select(self):
+        self.client.post(self.register_url, self.data, format='json')
+        serializer = RegisterSerializer(data=self.data)
+        with self.assertNumQueries(0):
+            self.assertTrue(serializer.is_valid())
+        response = self.client.post(self.register_url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', response.data)
+        self.assertEqual(CustomUser.objects.count(), 1)
+
+    def test_registration_statement_count_with_cached_role(self):
+        self.client.post(self.register_url, self.data, format='json')
+        serializer = RegisterSerializer(data={'email': 'second@example.com', 'password': 'testpassword123'})
+        serializer.is_valid(raise_exception=True)
+        # SAVEPOINT, INSERT пользователя, INSERT связи с ролью,
+        # INSERT ... SELECT эффективных разрешений, RELEASE SAVEPOINT
+        with self.assertNumQueries(5):
+            serializer.save()
+
+    def test_renamed_default_role_is_not_served_from_cache(self):
+        self.client.post(self.register_url, self.data, format='json')
+        self.user_role.name = 'Legacy'
+        self.user_role.save()
+        response = self.client.post(
+            self.register_url, {'email': 'late@example.com', 'password': 'testpassword123'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(CustomUser.objects.get(email='late@example.com').roles.exists())
+
+
+class EmailCanonicalizationTests(APITestCase):
+    """
+    Тесты регистронезависимой работы с email.
+    """
+    def setUp(self):
+        cache.clear()
+        self.register_url = reverse('auth_register')
+        self.login_url = reverse('token_obtain_pair')
+
+    def test_email_is_stored_in_canonical_form(self):
+        user = CustomUser.objects.create_user(email='  John.Doe@Example.COM ', password='password')
+        self.assertEqual(user.email, 'john.doe@example.com')
+
+    def test_login_is_case_insensitive(self):
+        CustomUser.objects.create_user(email='john@example.com', password='password')
+        response = self.client.post(self.login_url, {'email': 'JOHN@Example.com', 'password': 'password'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_natural_key_lookup_is_single_query(self):
+        CustomUser.objects.create_user(email='john@example.com', password='password')
+        with self.assertNumQueries(1):
+            user = CustomUser.objects.get_by_natural_key('John@Example.com')
+        self.assertEqual(user.email, 'john@example.com')
+
+    def test_registration_rejects_case_variant_duplicate(self):
+        CustomUser.objects.create_user(email='john@example.com', password='password')
+        response = self.client.post(
+            self.register_url, {'email': 'John@Example.com', 'password': 'testpassword123'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(CustomUser.objects.count(), 1)
+
+    def test_database_rejects_case_variant_duplicate(self):
+        CustomUser.objects.create_user(email='john@example.com', password='password')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CustomUser.objects.bulk_create([CustomUser(email='JOHN@example.com')])
+
+
+class BenchmarkCommandTests(APITestCase):
+    """
+    Тесты сидинга синтетических данных и команды нагрузочного теста.
+    """
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_db_creates_synthetic_rbac_graph(self):
+        call_command('seed_db', users=5, roles=2, resources=3, stdout=StringIO())
+        self.assertEqual(CustomUser.objects.filter(email__endswith='@bench.local').count(), 5)
+        self.assertEqual(Role.objects.filter(name__startswith='BenchRole').count(), 2)
+        self.assertEqual(Permission.objects.filter(resource__name__startswith='BenchResource').count(), 9)
+        for user in CustomUser.objects.filter(email__endswith='@bench.local'):
+            roles = set(user.roles.values_list('name', flat=True))
+            self.assertIn('User', roles)
+            self.assertTrue(roles - {'User'} <= {'BenchRole0', 'BenchRole1'})
+        for role in Role.objects.filter(name__startswith='BenchRole'):
+            self.assertGreater(role.permissions.count(), 0)
+
+    def test_seed_db_is_idempotent_and_tops_up(self):
+        call_command('seed_db', users=3, roles=2, resources=2, stdout=StringIO())
+        call_command('seed_db', users=5, roles=2, resources=2, stdout=StringIO())
+        self.assertEqual(CustomUser.objects.filter(email__endswith='@bench.local').count(), 5)
+        self.assertEqual(Resource.objects.filter(name__startswith='BenchResource').count(), 2)
+
+    def test_seed_db_is_a_fast_noop_when_seeded(self):
+        call_command('seed_db', stdout=StringIO())
+        out = StringIO()
+        with self.assertNumQueries(2):
+            call_command('seed_db', stdout=out)
+        self.assertIn('already seeded', out.getvalue())
+
+    def test_benchmark_reports_all_scenarios(self):
+        out = StringIO()
+        call_command(
+            'benchmark', seed_users=2, seed_roles=1, seed_resources=1,
+            requests=2, warmup=0, concurrency=1, stdout=out, stderr=StringIO(),
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['database'], connection.vendor)
+        self.assertEqual(set(report['scenarios']), {'login', 'refresh', 'profile', 'secret', 'admin_roles'})
+        for result in report['scenarios'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertEqual(result['requests'], 2)
+            self.assertGreater(result['queries_per_request'], 0)
+            self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['p99'])
+
+
+class MetricsTests(APITestCase):
+    """
+    Тесты сбора метрик и эндпоинта /metrics.
+    """
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.metrics_url = reverse('metrics')
+        CustomUser.objects.create_user(email='user@example.com', password='password')
+
+    def test_request_metrics_are_exposed(self):
+        login_response = self.client.post(
+            reverse('token_obtain_pair'), {'email': 'user@example.com', 'password': 'password'}, format='json'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {login_response.data["access"]}')
+        self.client.get(reverse('auth_profile'))
+
+        response = self.client.get(self.metrics_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('auth_tokens_issued_total{grant="password"} 1', body)
+        self.assertIn('auth_tokens_verified_total{result="valid",source="authentication"} 1', body)
+        self.assertIn(
+            'auth_http_request_duration_seconds_count{method="GET",status="200",view="auth_profile"} 1', body
+        )
+        self.assertIn('auth_db_queries_total{view="auth_profile"}', body)
+        self.assertIn('auth_password_hash_duration_seconds_count{algorithm="pbkdf2_sha256"}', body)
+        self.assertIn('# TYPE auth_http_request_duration_seconds histogram', body)
+
+    def test_metrics_are_aggregated_across_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            other = {'counters': [['auth_tokens_issued_total', [['grant', 'password']], 2]], 'histograms': []}
+            with open(os.path.join(directory, 'metrics-1.json'), 'w') as f:
+                json.dump(other, f)
+            metrics.inc('auth_tokens_issued_total', grant='password')
+            with override_settings(METRICS={'MULTIPROCESS_DIR': directory, 'FLUSH_INTERVAL': 1.0, 'TOKEN': None}):
+                body = metrics.render(metrics.collect())
+        self.assertIn('auth_tokens_issued_total{grant="password"} 3', body)
+
+    def test_metrics_token_is_enforced(self):
+        with override_settings(METRICS={'MULTIPROCESS_DIR': None, 'FLUSH_INTERVAL': 1.0, 'TOKEN': 'secret'}):
+            self.assertEqual(self.client.get(self.metrics_url).status_code, status.HTTP_403_FORBIDDEN)
+            response = self.client.get(self.metrics_url, HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AuthorizationCacheAndTracingTests(APITestCase):
+    """
+    Тесты кэша прав HasPermission и трассировки решений.
+    """
+    tracing = {
+        'ENABLED': True,
+        'SAMPLE_RATE': 1.0,
+        'BUFFER_SIZE': 10,
+        'SLOW_THRESHOLD_MS': 1000,
+        'SLOW_BUFFER_SIZE': 10,
+        'PROFILE_INTERVAL': 0,
+    }
+
+    def setUp(self):
+        cache.clear()
+        tracer.clear()
+        self.secret_url = reverse('secret_document')
+        self.traces_url = reverse('authz_traces')
+        self.viewer_role = Role.objects.create(name='Viewer')
+        self.viewer_role.permissions.add(Permission.objects.create(
+            resource=Resource.objects.create(name='SecretDocument'),
+            action=Action.objects.create(name='read'),
+        ))
+        self.user = CustomUser.objects.create_user(email='user@example.com', password='password')
+        self.user.roles.add(self.viewer_role)
+        self.superuser = CustomUser.objects.create_superuser(email='super@example.com', password='password')
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def test_cached_decision_needs_no_rbac_queries(self):
+        self.authenticate(self.user)
+        self.assertEqual(self.client.get(self.secret_url).status_code, status.HTTP_200_OK)
+        # Остается только загрузка пользователя в JWTAuthentication
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.secret_url).status_code, status.HTTP_200_OK)
+
+    def test_role_change_invalidates_cached_decision(self):
+        self.authenticate(self.user)
+        self.assertEqual(self.client.get(self.secret_url).status_code, status.HTTP_200_OK)
+        self.user.roles.remove(self.viewer_role)
+        self.assertEqual(self.client.get(self.secret_url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_role_permission_change_invalidates_cached_decision(self):
+        self.authenticate(self.user)
+        self.assertEqual(self.client.get(self.secret_url).status_code, status.HTTP_200_OK)
+        self.viewer_role.permissions.clear()
+        self.assertEqual(self.client.get(self.secret_url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_evicted_version_does_not_revive_stale_decisions(self):
+        tenant_id = self.user.tenant_id
+        # Версия заново заводится в пустом кэше, как после вытеснения
+        cache.clear()
+        self.assertEqual(get_cached_permissions(self.user)[1], {'read SecretDocument'})
+        self.viewer_role.permissions.clear()
+        # Ключ версии вытеснен из кэша, запись со старой версией осталась
+        cache.delete(rbac_version_key(tenant_id))
+        get_rbac_version(tenant_id)
+        _, permissions, cache_hit = get_cached_permissions(self.user)
+        self.assertFalse(cache_hit)
+        self.assertEqual(permissions, frozenset())
+
+    def test_decisions_are_traced(self):
+        self.authenticate(self.user)
+        with override_settings(AUTHZ_TRACING=self.tracing):
+            self.client.get(self.secret_url)
+            self.client.get(self.secret_url)
+            self.authenticate(self.superuser)
+            response = self.client.get(self.traces_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['enabled'])
+        first, second = response.data['decisions']
+        self.assertEqual(first['user_id'], self.user.id)
+        self.assertEqual(first['required_permission'], 'read SecretDocument')
+        self.assertTrue(first['granted'])
+        self.assertEqual(first['roles'], ['Viewer'])
+        self.assertEqual((first['cache'], second['cache']), ('miss', 'hit'))
+        self.assertGreater(first['queries'], 0)
+        self.assertEqual(second['queries'], 0)
+
+    def test_slow_decisions_are_profiled(self):
+        self.authenticate(self.user)
+        with override_settings(AUTHZ_TRACING=dict(self.tracing, SAMPLE_RATE=0.0, SLOW_THRESHOLD_MS=0)):
+            self.client.get(self.secret_url)
+            self.authenticate(self.superuser)
+            response = self.client.get(self.traces_url, {'slow': '1'})
+        [record] = response.data['decisions']
+        self.assertIn('get_effective_permissions', record['profile'])
+
+    def test_traces_are_admin_only(self):
+        self.authenticate(self.user)
+        self.assertEqual(self.client.get(self.traces_url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ApiOnlyProfileTests(APITestCase):
+    """
+    Тесты профиля развертывания 'api'. Профиль выбирается при загрузке
+    настроек, поэтому проверки выполняются в отдельном процессе.
+    """
+    probe = """
+import json, django
+django.setup()
+from django.conf import settings
+from django.test import Client
+settings.ALLOWED_HOSTS.append('testserver')
+client = Client()
+print(json.dumps({
+    'middleware': settings.MIDDLEWARE,
+    'apps': settings.INSTALLED_APPS,
+    'schema': client.get('/swagger.json').json(),
+    'swagger_ui': client.get('/swagger/').status_code,
+    'admin': client.get('/admin/').status_code,
+    'secret': [client.get('/api/secret/').status_code, client.get('/api/secret/')['Content-Type']],
+}))
+"""
+
+    def test_api_profile_drops_session_stack_and_serves_static_schema(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as schema:
+            json.dump({'swagger': '2.0'}, schema)
+            schema.flush()
+            env = dict(os.environ, DJANGO_PROFILE='api', OPENAPI_SCHEMA_FILE=schema.name)
+            completed = subprocess.run(
+                [sys.executable, '-c', self.probe], cwd=settings.BASE_DIR, env=env,
+                capture_output=True, text=True, check=True,
+            )
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        self.assertNotIn('django.contrib.sessions.middleware.SessionMiddleware', result['middleware'])
+        self.assertNotIn('django.middleware.csrf.CsrfViewMiddleware', result['middleware'])
+        self.assertNotIn('drf_yasg', result['apps'])
+        self.assertNotIn('django.contrib.admin', result['apps'])
+        self.assertEqual(result['schema'], {'swagger': '2.0'})
+        self.assertEqual(result['swagger_ui'], 200)
+        self.assertEqual(result['admin'], 404)
+        self.assertEqual(result['secret'], [401, 'application/json'])
+
+    def test_benchmark_profiles_reports_startup(self):
+        out = StringIO()
+        call_command('benchmark_profiles', startup_runs=1, skip_requests=True, stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertLess(report['api']['middleware'], report['full']['middleware'])
+        self.assertGreater(report['api']['startup_ms']['setup_median'], 0)
+
+
+class OpenAPISchemaTests(APITestCase):
+    """
+    Тесты предварительно собранной схемы OpenAPI.
+    """
+    def setUp(self):
+        self.schema_file = tempfile.NamedTemporaryFile(suffix='.json')
+        self.addCleanup(self.schema_file.close)
+        override = override_settings(OPENAPI_SCHEMA_FILE=self.schema_file.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        get_schema_document.cache_clear()
+        self.addCleanup(get_schema_document.cache_clear)
+        self.url = reverse('schema-json')
+
+    def test_build_command_writes_schema(self):
+        with self.assertLogs('drf_yasg', level='WARNING') as logs:
+            # assertLogs требует хотя бы одну запись; прочие предупреждения drf_yasg не относятся к делу
+            logging.getLogger('drf_yasg').warning('marker')
+            call_command('build_openapi_schema', stdout=StringIO(), stderr=StringIO())
+        self.assertFalse([message for message in logs.output if 'get_queryset raised' in message])
+        with open(self.schema_file.name) as f:
+            schema = json.load(f)
+        self.assertEqual(schema['info']['title'], 'Auth Service API')
+        self.assertIn('/api/login/', schema['paths'])
+
+    def test_schema_served_from_memory_with_etag(self):
+        self.schema_file.write(b'{"swagger": "2.0"}')
+        self.schema_file.flush()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'swagger': '2.0'})
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        etag = response['ETag']
+
+        # Файл больше не читается: копия в памяти живет до перезапуска процесса
+        with mock.patch('builtins.open', side_effect=AssertionError('schema re-read')):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_missing_file_falls_back_to_generation(self):
+        with override_settings(OPENAPI_SCHEMA_FILE=self.schema_file.name + '.missing'):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('/api/login/', response.json()['paths'])
+
+    def test_docs_pages_point_to_schema(self):
+        for name in ('schema-swagger-ui', 'schema-redoc'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertContains(response, self.url)
+
+
+class StartupTests(APITestCase):
+    """
+    Тесты подготовки БД при старте контейнера и профилировщика старта.
+    """
+    def setUp(self):
+        cache.clear()
+        call_command('seed_db', stdout=StringIO())
+
+    def test_prepare_db_skips_when_migrations_applied(self):
+        out = StringIO()
+        with mock.patch('core.management.commands.prepare_db.call_command') as run:
+            call_command('prepare_db', stdout=out)
+        run.assert_not_called()
+        self.assertIn('is up to date', out.getvalue())
+
+    def test_prepare_db_migrates_when_migration_pending(self):
+        pending = disk_migrations() | {('core', '9999_pending')}
+        with mock.patch('core.management.commands.prepare_db.disk_migrations', return_value=pending), \
+                mock.patch('core.management.commands.prepare_db.call_command') as run:
+            call_command('prepare_db', stdout=StringIO())
+        self.assertEqual([call.args[0] for call in run.call_args_list], ['migrate', 'seed_db'])
+
+    def test_prepare_db_seeds_when_seed_missing(self):
+        Role.objects.filter(name='Gateway').delete()
+        with mock.patch('core.management.commands.prepare_db.call_command') as run:
+            call_command('prepare_db', stdout=StringIO())
+        self.assertEqual([call.args[0] for call in run.call_args_list], ['seed_db'])
+
+    def test_profile_startup_reports_phases_and_apps(self):
+        out = StringIO()
+        call_command('profile_startup', runs=1, top=5, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertGreater(report['phases_ms']['total_ms'], 0)
+        self.assertIn('core', report['apps_ms'])
+        self.assertEqual(len(report['modules_cumulative_ms']), 5)
+
+
+class HealthCheckTests(APITestCase):
+    """
+    Тесты проб /healthz, /readyz и ожидания БД.
+    """
+    def setUp(self):
+        readiness.reset()
+        self.addCleanup(readiness.reset)
+
+    def test_healthz_does_not_touch_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('healthz'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_readyz_checks_database_and_migrations_then_caches(self):
+        response = self.client.get(reverse('readyz'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['checks'], {'database': {'status': 'ok'}, 'migrations': {'status': 'ok'}})
+        self.assertIn('no-store', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('readyz'))
+
+    def test_readyz_unavailable_when_database_down(self):
+        with mock.patch('core.health.check_database', return_value='OperationalError: connection refused'):
+            response = self.client.get(reverse('readyz'))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()['checks']['database']['status'], 'error')
+
+    def test_readyz_unavailable_with_pending_migrations(self):
+        with mock.patch('core.health.pending_migrations', return_value={('core', '9999_pending')}):
+            response = self.client.get(reverse('readyz'))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()['checks']['migrations']['pending'], ['core.9999_pending'])
+
+    def test_wait_for_database_backs_off_with_jitter(self):
+        with mock.patch('core.health.check_database', side_effect=['refused', 'refused', 'refused', None]), \
+                mock.patch('core.health.random.uniform', side_effect=lambda low, high: high) as uniform, \
+                mock.patch('core.health.time.sleep') as sleep:
+            self.assertTrue(wait_for_database(timeout=60, max_delay=0.3, log=lambda message: None))
+        self.assertEqual([call.args for call in uniform.call_args_list], [(0, 0.1), (0, 0.2), (0, 0.3)])
+        self.assertEqual(sleep.call_count, 3)
+
+    def test_wait_for_database_gives_up_after_timeout(self):
+        with mock.patch('core.health.check_database', return_value='refused'), \
+                mock.patch('core.health.time.sleep'):
+            self.assertFalse(wait_for_database(timeout=0, max_delay=1, log=lambda message: None))
+
+
+class ConditionalGetTests(APITestCase):
+    """
+    Тесты ETag/304 для профиля и кэша справочников RBAC.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='user@example.com', password='password')
+        self.superuser = CustomUser.objects.create_superuser(email='super@example.com', password='password')
+        self.read = Permission.objects.create(
+            resource=Resource.objects.create(name='Document'), action=Action.objects.create(name='read'),
+        )
+        self.role = Role.objects.create(name='Reader')
+        self.role.permissions.add(self.read)
+        self.user.roles.add(self.role)
+        self.profile_url = reverse('auth_profile')
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def test_profile_not_modified_without_serializing(self):
+        self.authenticate(self.user)
+        response = self.client.get(self.profile_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        with mock.patch.object(UserSerializer, 'to_representation') as to_representation:
+            response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        to_representation.assert_not_called()
+
+    def test_profile_etag_changes_with_user_and_roles(self):
+        self.authenticate(self.user)
+        etags = [self.client.get(self.profile_url)['ETag']]
+
+        self.client.patch(self.profile_url, {'first_name': 'Ann'}, format='json')
+        etags.append(self.client.get(self.profile_url)['ETag'])
+
+        self.role.name = 'Viewer'
+        self.role.save()
+        etags.append(self.client.get(self.profile_url)['ETag'])
+
+        self.user.roles.clear()
+        etags.append(self.client.get(self.profile_url)['ETag'])
+        self.assertEqual(len(set(etags)), 4)
+
+    def test_role_etag_changes_when_permission_deleted(self):
+        self.authenticate(self.superuser)
+        url = reverse('role-detail', args=[self.role.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Каскадное удаление не шлет m2m_changed, но меняет набор разрешений роли
+        self.read.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['permissions'], [])
+
+    def test_catalog_served_from_cache_and_invalidated_on_change(self):
+        self.authenticate(self.superuser)
+        url = reverse('resource-list')
+        response = self.client.get(url)
+        self.assertEqual(response.json(), [{'id': self.read.resource_id, 'name': 'Document'}])
+
+        # Только запрос пользователя при аутентификации
+        with self.assertNumQueries(1):
+            cached = self.client.get(url)
+        self.assertEqual(cached.content, response.content)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=cached['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Resource.objects.create(name='Report')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=cached['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['name'] for item in response.json()], ['Document', 'Report'])
+
+    def test_catalog_invalidated_by_synthetic_seeding(self):
+        call_command('seed_db', stdout=StringIO())
+        self.authenticate(self.superuser)
+        url = reverse('resource-list')
+        etag = self.client.get(url)['ETag']
+
+        # Синтетические данные вставляются в обход сигналов
+        call_command('seed_db', resources=2, stdout=StringIO())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('BenchResource1', [item['name'] for item in response.json()])
+
+    def test_catalog_permissions_match_uncached_rendering(self):
+        self.authenticate(self.superuser)
+        url = reverse('permission-list')
+        cached = self.client.get(url).json()
+        uncached = self.client.get(url, {'format': 'json'}).json()
+        self.assertEqual(cached, uncached)
+        self.assertEqual(cached, [{'id': self.read.pk, 'resource': 'Document', 'action': 'read'}])
+
+
+class FastJSONTests(APITestCase):
+    """
+    Тесты JSON-рендерера и парсера на orjson и быстрых путей сериализаторов.
+    """
+    def test_renderer_matches_drf_renderer(self):
+        data = {
+            'text': 'Привет \u2028 мир',
+            'when': datetime.datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc),
+            'amount': decimal.Decimal('1.50'),
+            'items': [1, 2.5, None, True],
+            'lazy': gettext_lazy('email address'),
+            1: 'int key',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_renderer_falls_back(self):
+        huge = {'value': 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(huge), JSONRenderer().render(huge))
+        indented = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(indented, JSONRenderer().render({'a': 1}, 'application/json; indent=2'))
+        with mock.patch('core.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render({'a': 1}), b'{"a":1}')
+
+    def test_parser_matches_drf_parser(self):
+        body = '{"email": "ÜSER@example.com", "n": [1, 2.5, null]}'.encode()
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        for invalid in (b'{"a": NaN}', b'{"a": '):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(BytesIO(invalid))
+
+    def test_serializer_fast_paths_match_generic_representation(self):
+        role = Role.objects.create(name='Reader')
+        user = CustomUser.objects.create_user(email='user@example.com', password='password', first_name='Ann')
+        user.roles.add(role)
+        serializer = UserSerializer(user)
+        self.assertEqual(serializer.data, ModelSerializer.to_representation(serializer, user))
+
+        permission = Permission.objects.create(
+            resource=Resource.objects.create(name='Document'), action=Action.objects.create(name='read'),
+        )
+        serializer = PermissionSerializer(permission)
+        self.assertEqual(serializer.data, ModelSerializer.to_representation(serializer, permission))
+
+    def test_json_benchmark_reports_endpoints(self):
+        call_command('seed_db', stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark_json', iterations=5, stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['endpoints']), {'login', 'refresh', 'profile', 'permissions'})
+        self.assertGreater(report['endpoints']['profile']['stages']['serialize']['baseline_us'], 0)
+
+
+class EffectivePermissionTests(APITestCase):
+    """
+    Тесты денормализованной таблицы эффективных разрешений и обратного поиска.
+    """
+    def setUp(self):
+        cache.clear()
+        self.document = Resource.objects.create(name='Document')
+        self.read = Permission.objects.create(resource=self.document, action=Action.objects.create(name='read'))
+        self.write = Permission.objects.create(resource=self.document, action=Action.objects.create(name='write'))
+        self.reader = Role.objects.create(name='Reader')
+        self.reader.permissions.add(self.read)
+        self.editor = Role.objects.create(name='Editor')
+        self.editor.permissions.add(self.read, self.write)
+        self.user = CustomUser.objects.create_user(email='user@example.com', password='password')
+        self.superuser = CustomUser.objects.create_superuser(email='super@example.com', password='password')
+
+    def effective(self):
+        return set(UserEffectivePermission.objects.values_list('user__email', 'permission__action__name'))
+
+    def expected(self):
+        return {
+            (user.email, action)
+            for user in CustomUser.objects.all()
+            for action in user.roles.values_list('permissions__action__name', flat=True)
+            if action
+        }
+
+    def test_user_role_changes_are_synced(self):
+        self.user.roles.add(self.reader, self.editor)
+        self.assertEqual(self.effective(), {('user@example.com', 'read'), ('user@example.com', 'write')})
+        self.user.roles.remove(self.editor)
+        self.assertEqual(self.effective(), {('user@example.com', 'read')})
+        self.user.roles.clear()
+        self.assertEqual(self.effective(), set())
+
+    def test_reverse_and_role_permission_changes_are_synced(self):
+        self.reader.customuser_set.add(self.user, self.superuser)
+        self.editor.customuser_set.add(self.user)
+        self.reader.permissions.add(self.write)
+        self.assertEqual(self.effective(), self.expected())
+        self.editor.permissions.remove(self.write)
+        self.assertEqual(self.effective(), self.expected())
+        self.write.role_set.clear()
+        self.assertEqual(self.effective(), self.expected())
+        self.reader.customuser_set.clear()
+        self.assertEqual(self.effective(), self.expected())
+        self.assertEqual(self.effective(), {('user@example.com', 'read')})
+
+    def test_deletes_are_synced(self):
+        self.user.roles.add(self.reader, self.editor)
+        self.superuser.roles.add(self.editor)
+        self.editor.delete()
+        self.assertEqual(self.effective(), {('user@example.com', 'read')})
+        self.read.delete()
+        self.assertEqual(self.effective(), set())
+
+    def test_registration_grants_default_role_permissions(self):
+        user_role = Role.objects.create(name='User')
+        user_role.permissions.add(self.read)
+        response = self.client.post(
+            reverse('auth_register'), {'email': 'new@example.com', 'password': 'testpassword123'}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.effective(), {('new@example.com', 'read')})
+
+    def test_refresh_command_repairs_drift(self):
+        self.user.roles.add(self.editor)
+        UserEffectivePermission.objects.filter(permission=self.write).delete()
+        UserEffectivePermission.objects.create(user=self.superuser, permission=self.read)
+        out = StringIO()
+        call_command('refresh_effective_permissions', stdout=out)
+        self.assertIn('1 added, 1 removed', out.getvalue())
+        self.assertEqual(self.effective(), self.expected())
+
+    def test_full_refresh_skips_roles_without_users(self):
+        self.user.roles.add(self.reader)
+        UserEffectivePermission.objects.all().delete()
+        # Editor без пользователей; SQLite проглотил бы NULL в INSERT OR IGNORE,
+        # поэтому проверяем саму выборку
+        with mock.patch('core.rbac._insert_ignore_conflicts', wraps=rbac._insert_ignore_conflicts) as insert:
+            self.assertEqual(refresh_effective_permissions(), (1, 0))
+        source = insert.call_args.args[2]
+        self.assertEqual(list(source), [(self.user.pk, self.read.pk)])
+        self.assertEqual(self.effective(), self.expected())
+
+    def test_seeded_synthetic_users_are_backfilled(self):
+        call_command('seed_db', users=5, roles=2, resources=3, stdout=StringIO())
+        self.assertEqual(self.effective(), self.expected())
+        self.assertTrue(UserEffectivePermission.objects.filter(user__email__endswith='@bench.local').exists())
+
+    def test_users_with_permission(self):
+        self.user.roles.add(self.reader)
+        self.superuser.roles.add(self.editor)
+        tenant_id = self.document.tenant_id
+        self.assertEqual(set(users_with_permission(tenant_id, 'read', 'Document')), {self.user, self.superuser})
+        self.assertEqual(list(users_with_permission(tenant_id, 'write', 'Document')), [self.superuser])
+
+    def test_reverse_lookup_endpoint_is_paginated(self):
+        users = [
+            CustomUser.objects.create_user(email=f'reader{i}@example.com', password='password') for i in range(5)
+        ]
+        self.reader.customuser_set.add(*users)
+        self.editor.customuser_set.add(users[0])
+        url = reverse('permission-users', args=[self.read.pk])
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.superuser).access_token}')
+        seen = []
+        next_url = f'{url}?page_size=2'
+        while next_url:
+            with self.assertNumQueries(3):
+                # Пользователь из токена, разрешение (404) и страница; COUNT(*) не выполняется
+                response = self.client.get(next_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen += [item['email'] for item in response.data['results']]
+            next_url = response.data['next']
+        self.assertEqual(seen, [user.email for user in users])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'email', 'is_active'})
+
+
+class AuditLogTests(APITestCase):
+    """
+    Тесты асинхронного журнала аудита.
+    """
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        # Без фонового потока: события пишутся явным flush() в транзакции теста
+        audit.start(background=False)
+        self.addCleanup(audit.stop)
+        self.document = Resource.objects.create(name='Document')
+        self.role = Role.objects.create(name='Reader')
+        self.user = CustomUser.objects.create_user(email='user@example.com', password='password')
+        self.superuser = CustomUser.objects.create_superuser(email='super@example.com', password='password')
+
+    def config(self, **overrides):
+        return dict(settings.AUDIT, **overrides)
+
+    def events(self):
+        return list(AuditEvent.objects.order_by('id').values_list('event', 'user_id'))
+
+    def test_token_lifecycle_is_recorded_off_the_request_path(self):
+        login_url = reverse('token_obtain_pair')
+        self.client.post(login_url, {'email': 'user@example.com', 'password': 'wrong'}, format='json')
+        tokens = self.client.post(login_url, {'email': 'user@example.com', 'password': 'password'}, format='json').data
+        # Refresh-токен ротируется: выходим с новым
+        tokens = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json').data
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        response = self.client.post(reverse('auth_logout'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_205_RESET_CONTENT)
+        self.client.delete(reverse('auth_profile'))
+        # Запросы ничего не пишут в журнал сами
+        self.assertEqual(AuditEvent.objects.count(), 0)
+
+        self.assertEqual(audit.flush(), 5)
+        self.assertEqual(self.events(), [
+            ('login_failed', None), ('login', self.user.pk), ('refresh', self.user.pk),
+            ('logout', self.user.pk), ('account_deactivated', self.user.pk),
+        ])
+        failed = AuditEvent.objects.get(event='login_failed')
+        self.assertEqual(failed.details, {'email': 'user@example.com'})
+        self.assertEqual(failed.ip, '127.0.0.1')
+
+    def test_denied_permission_and_role_changes_are_recorded(self):
+        # Анонимный отказ не ставится в очередь
+        self.assertEqual(self.client.get(reverse('secret_document')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.assertEqual(self.client.get(reverse('secret_document')).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.roles.add(self.role)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.superuser).access_token}')
+        self.client.patch(reverse('role-detail', args=[self.role.pk]), {'name': 'Viewer'}, format='json')
+        self.client.delete(reverse('role-detail', args=[self.role.pk]))
+        audit.flush()
+
+        denied, assigned, updated, deleted = AuditEvent.objects.order_by('id')
+        self.assertEqual((denied.event, denied.user_id), ('permission_denied', self.user.pk))
+        self.assertEqual(denied.details['reason'], 'missing_permission')
+        self.assertEqual(denied.details['required_permission'], 'read SecretDocument')
+        self.assertEqual((assigned.event, assigned.user_id), ('user_roles_changed', self.user.pk))
+        self.assertEqual(assigned.details, {'operation': 'add', 'roles': [self.role.pk]})
+        self.assertEqual((updated.event, updated.user_id), ('role_changed', self.superuser.pk))
+        self.assertEqual(updated.details, {'operation': 'update', 'role_id': self.role.pk, 'role': 'Viewer', 'permissions': []})
+        self.assertEqual(deleted.details['operation'], 'delete')
+
+    def test_flush_writes_in_batches(self):
+        for user_id in range(5):
+            audit.record('login', user_id=user_id)
+        with override_settings(AUDIT=self.config(BATCH_SIZE=2)):
+            with self.assertNumQueries(3):
+                self.assertEqual(audit.flush(), 5)
+        self.assertEqual(AuditEvent.objects.count(), 5)
+
+    def test_full_queue_applies_backpressure_then_drops(self):
+        audit.stop()
+        with override_settings(AUDIT=self.config(QUEUE_SIZE=2, PUT_TIMEOUT=0.01)):
+            audit.start(background=False)
+            for user_id in range(3):
+                audit.record('login', user_id=user_id)
+        self.assertEqual(audit.flush(), 2)
+        counters = {tuple(labels): value for name, labels, value in metrics.registry.snapshot()['counters']
+                    if name == 'auth_audit_events_total'}
+        self.assertEqual(counters[('event', 'login'), ('result', 'dropped')], 1)
+
+    def test_background_worker_writes_ndjson_and_drains_on_stop(self):
+        audit.stop()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'audit.ndjson')
+            log = AuditLog()
+            with override_settings(AUDIT=self.config(SINK='file', FILE=path, FLUSH_INTERVAL=0.05)), \
+                    mock.patch.object(AuditLog, '_install_sigterm_handler') as install_sigterm_handler:
+                log.start()
+                log.record('login', user_id=1)
+                # Пакет уходит по истечении интервала, без остановки журнала
+                for _ in range(100):
+                    if os.path.exists(path):
+                        break
+                    time.sleep(0.02)
+                with open(path) as f:
+                    self.assertEqual(json.loads(f.readline())['event'], 'login')
+
+                settings.AUDIT['FLUSH_INTERVAL'] = 60
+                log.record('logout', user_id=1, jti='abc')
+                log.stop()
+            install_sigterm_handler.assert_called_once()
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual([line['event'] for line in lines], ['login', 'logout'])
+        self.assertEqual(lines[1]['details'], {'jti': 'abc'})
+        self.assertFalse(log._started)
+
+
+class TenancyTests(APITestCase):
+    """
+    Тесты разделения RBAC между арендаторами.
+    """
+    def setUp(self):
+        cache.clear()
+        self.default = Tenant.objects.get(pk=settings.TENANCY['DEFAULT_TENANT_ID'])
+        self.acme = Tenant.objects.create(slug='acme', name='Acme')
+        # Одинаковые имена у разных арендаторов
+        self.graph = {tenant.pk: self.create_graph(tenant) for tenant in (self.default, self.acme)}
+        self.admin = CustomUser.objects.create_superuser(email='admin@acme.example', password='password', tenant=self.acme)
+        self.secret_url = reverse('secret_document')
+
+    def create_graph(self, tenant):
+        resource = Resource.objects.create(tenant=tenant, name='SecretDocument')
+        permission = Permission.objects.create(resource=resource, action=Action.objects.create(tenant=tenant, name='read'))
+        role = Role.objects.create(tenant=tenant, name='Reader')
+        role.permissions.add(permission)
+        user = CustomUser.objects.create_user(email=f'reader@{tenant.slug}.example', password='password', tenant=tenant)
+        user.roles.add(role)
+        return {'permission': permission, 'role': role, 'user': user}
+
+    def authenticate(self, user):
+        token = TenantTokenObtainPairSerializer.get_token(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+
+    def test_permission_inherits_resource_tenant(self):
+        self.assertEqual(self.graph[self.acme.pk]['permission'].tenant_id, self.acme.pk)
+        self.assertEqual(Role.objects.filter(name='Reader').count(), 2)
+
+    def test_admin_viewsets_are_tenant_scoped(self):
+        self.authenticate(self.admin)
+        acme_role = self.graph[self.acme.pk]['role']
+        default_role = self.graph[self.default.pk]['role']
+
+        response = self.client.get(reverse('role-list'))
+        self.assertEqual([role['id'] for role in response.json()], [acme_role.pk])
+        response = self.client.get(reverse('permission-list'))
+        self.assertEqual([p['id'] for p in response.json()], [self.graph[self.acme.pk]['permission'].pk])
+        self.assertEqual(
+            self.client.get(reverse('role-detail', args=[default_role.pk])).status_code, status.HTTP_404_NOT_FOUND,
+        )
+        users_url = reverse('permission-users', args=[self.graph[self.default.pk]['permission'].pk])
+        self.assertEqual(self.client.get(users_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_created_objects_belong_to_the_request_tenant(self):
+        self.authenticate(self.admin)
+        response = self.client.post(reverse('resource-list'), {'name': 'Report', 'tenant': self.default.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('tenant', response.data)
+        self.assertEqual(Resource.objects.get(pk=response.data['id']).tenant_id, self.acme.pk)
+
+        # Имя уникально в пределах арендатора, но может повторяться у разных
+        response = self.client.post(reverse('action-list'), {'name': 'read'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('action-list'), {'name': 'write'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_authz_traces_are_tenant_scoped(self):
+        tracing = dict(AuthorizationCacheAndTracingTests.tracing, ENABLED=True)
+        default_admin = CustomUser.objects.create_superuser(email='admin@default.example', password='password')
+        with override_settings(AUTHZ_TRACING=tracing):
+            tracer.clear()
+            self.addCleanup(tracer.clear)
+            for tenant in (self.default, self.acme):
+                self.authenticate(self.graph[tenant.pk]['user'])
+                self.client.get(self.secret_url)
+
+            self.authenticate(self.admin)
+            decisions = self.client.get(reverse('authz_traces')).data['decisions']
+            self.assertEqual([record['user'] for record in decisions], ['reader@acme.example'])
+            # Очистка не затрагивает трассы другого арендатора
+            self.client.delete(reverse('authz_traces'))
+            self.authenticate(default_admin)
+            decisions = self.client.get(reverse('authz_traces')).data['decisions']
+            self.assertEqual([record['user'] for record in decisions], ['reader@default.example'])
+
+    def test_role_cannot_get_foreign_tenant_permissions(self):
+        self.authenticate(self.admin)
+        url = reverse('role-detail', args=[self.graph[self.acme.pk]['role'].pk])
+        foreign = self.graph[self.default.pk]['permission']
+        response = self.client.patch(url, {'permissions': [foreign.pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('permissions', response.data)
+
+    def test_foreign_role_grants_nothing(self):
+        # Связь с ролью другого арендатора, записанная в обход API, не дает прав
+        user = CustomUser.objects.create_user(email='other@acme.example', password='password', tenant=self.acme)
+        user.roles.add(self.graph[self.default.pk]['role'])
+        roles, permissions, _ = get_cached_permissions(user)
+        self.assertEqual((roles, permissions), ([], frozenset()))
+
+        # Ни в денормализованной таблице, ни в обратном поиске
+        refresh_effective_permissions()
+        self.assertFalse(UserEffectivePermission.objects.filter(user=user).exists())
+        UserEffectivePermission.objects.create(user=user, permission=self.graph[self.default.pk]['permission'])
+        self.assertEqual(list(users_with_permission(self.default.pk, 'read', 'SecretDocument')),
+                         [self.graph[self.default.pk]['user']])
+        default_admin = CustomUser.objects.create_superuser(email='admin@default.example', password='password')
+        self.authenticate(default_admin)
+        response = self.client.get(reverse('permission-users', args=[self.graph[self.default.pk]['permission'].pk]))
+        self.assertEqual([item['email'] for item in response.json()['results']], ['reader@default.example'])
+        self.assertEqual(refresh_effective_permissions(users=[user.pk]), (0, 1))
+
+    def test_tenant_caches_are_invalidated_independently(self):
+        acme_user = self.graph[self.acme.pk]['user']
+        default_user = self.graph[self.default.pk]['user']
+        get_cached_permissions(acme_user)
+        get_cached_permissions(default_user)
+
+        self.graph[self.default.pk]['role'].permissions.clear()
+        with self.assertNumQueries(0):
+            _, permissions, cache_hit = get_cached_permissions(acme_user)
+        self.assertTrue(cache_hit)
+        self.assertEqual(permissions, {'read SecretDocument'})
+        _, permissions, cache_hit = get_cached_permissions(default_user)
+        self.assertFalse(cache_hit)
+        self.assertEqual(permissions, frozenset())
+
+    def test_catalog_cache_is_per_tenant(self):
+        default_admin = CustomUser.objects.create_superuser(email='admin@default.example', password='password')
+        bodies = {}
+        for admin in (self.admin, default_admin):
+            self.authenticate(admin)
+            self.client.get(reverse('role-list'))
+            bodies[admin.tenant_id] = self.client.get(reverse('role-list')).json()
+        self.assertEqual(bodies[self.acme.pk][0]['id'], self.graph[self.acme.pk]['role'].pk)
+        self.assertEqual(bodies[self.default.pk][0]['id'], self.graph[self.default.pk]['role'].pk)
+
+        bump_rbac_version(self.default.pk)
+        self.authenticate(self.admin)
+        with self.assertNumQueries(1):
+            # Только пользователь из токена: справочник Acme все еще в кэше
+            self.client.get(reverse('role-list'))
+
+    def test_tokens_carry_and_enforce_the_tenant_claim(self):
+        user = self.graph[self.acme.pk]['user']
+        tokens = self.client.post(
+            reverse('token_obtain_pair'), {'email': user.email, 'password': 'password'}, format='json',
+        ).data
+        self.assertEqual(AccessToken(tokens['access'])['tenant_id'], self.acme.pk)
+        refreshed = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json').data
+        self.assertEqual(AccessToken(refreshed['access'])['tenant_id'], self.acme.pk)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refreshed["access"]}')
+        self.assertEqual(self.client.get(self.secret_url).status_code, status.HTTP_200_OK)
+
+        # Пользователь перенесен к другому арендатору: старые токены недействительны
+        CustomUser.objects.filter(pk=user.pk).update(tenant=self.default)
+        self.assertEqual(self.client.get(self.secret_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_moving_user_to_another_tenant_invalidates_caches_and_tokens(self):
+        user = CustomUser.objects.get(pk=self.graph[self.default.pk]['user'].pk)
+        token = str(TenantTokenObtainPairSerializer.get_token(user).access_token)
+        self.assertTrue(introspect_tokens([token])[0]['active'])
+        self.assertEqual(get_cached_permissions(user)[1], {'read SecretDocument'})
+
+        user.tenant = self.acme
+        user.save()
+        # Закэшированный результат интроспекции больше не выдается
+        self.assertFalse(introspect_tokens([token])[0]['active'])
+        roles, permissions, cache_hit = get_cached_permissions(user)
+        self.assertFalse(cache_hit)
+        self.assertEqual((roles, permissions), ([], frozenset()))
+        self.assertFalse(UserEffectivePermission.objects.filter(user=user).exists())
+
+    def test_introspection_reports_tenant(self):
+        gateway_role = Role.objects.create(tenant=self.acme, name='Gateway')
+        gateway_role.permissions.add(Permission.objects.create(
+            resource=Resource.objects.create(tenant=self.acme, name='Token'),
+            action=Action.objects.create(tenant=self.acme, name='introspect'),
+        ))
+        gateway = CustomUser.objects.create_user(email='gateway@acme.example', password='password', tenant=self.acme)
+        gateway.roles.add(gateway_role)
+        self.authenticate(gateway)
+        user = self.graph[self.acme.pk]['user']
+        token = str(TenantTokenObtainPairSerializer.get_token(user).access_token)
+        for _ in range(2):
+            response = self.client.post(reverse('token_introspect'), {'token': token}, format='json')
+            self.assertEqual(response.data['tenant_id'], self.acme.pk)
+            self.assertEqual(response.data['permissions'], ['read SecretDocument'])
@@ -0,0 +1,103 @@
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Ограничение частоты запросов по алгоритму "скользящего окна со счетчиками".
+
+    В отличие от `SimpleRateThrottle`, который хранит в кэше список временных
+    меток всех запросов (O(N) памяти и сериализация списка на каждый запрос),
+    здесь на ключ приходится два целочисленных счетчика: текущего и предыдущего
+    окна. Количество запросов за последние `duration` секунд оценивается как
+    `previous * (1 - доля прошедшего окна) + current`.
+
+    Троттлинг выполняется в `APIView.initial()`, то есть до валидации
+    сериализатора — отклоненные попытки не доходят до хэширования пароля.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        current_key = f'{self.key}:{window}'
+        previous_key = f'{self.key}:{window - 1}'
+        counts = self.cache.get_many([current_key, previous_key])
+        self.current = counts.get(current_key, 0)
+        self.previous = counts.get(previous_key, 0)
+        self.elapsed = (self.now % self.duration) / self.duration
+
+        if self.previous * (1 - self.elapsed) + self.current >= self.num_requests:
+            return self.throttle_failure()
+
+        # Окно хранится две длительности: пока оно нужно как "предыдущее"
+        if not self.cache.add(current_key, 1, timeout=2 * self.duration):
+            try:
+                self.cache.incr(current_key)
+            except ValueError:
+                # Ключ истек между add и incr
+                self.cache.set(current_key, 1, timeout=2 * self.duration)
+        return True
+
+    def wait(self):
+        window_remaining = self.duration * (1 - self.elapsed)
+        if self.current >= self.num_requests or not self.previous:
+            return window_remaining
+        # Ждем, пока вклад предыдущего окна не опустится ниже лимита
+        needed_elapsed = 1 - (self.num_requests - 1 - self.current) / self.previous
+        return max(min((needed_elapsed - self.elapsed) * self.duration, window_remaining), 0)
+
+
+class IPRateThrottle(SlidingWindowRateThrottle):
+    """
+    Ограничение по IP-адресу клиента (с учетом `NUM_PROXIES`).
+    """
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class AccountRateThrottle(SlidingWindowRateThrottle):
+    """
+    Ограничение по учетной записи (email из тела запроса).
+    Защищает от распределенного подбора пароля к одному аккаунту с разных IP.
+    """
+    account_field = 'email'
+
+    def get_cache_key(self, request, view):
+        account = request.data.get(self.account_field) if hasattr(request.data, 'get') else None
+        if not account or not isinstance(account, str):
+            return None
+        # Хэшируем email: ключи кэша не должны содержать произвольные символы
+        ident = hashlib.sha256(account.strip().lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class LoginRateThrottle(IPRateThrottle):
+    scope = 'login'
+
+
+class LoginAccountRateThrottle(AccountRateThrottle):
+    scope = 'login_account'
+
+
+class RegisterRateThrottle(IPRateThrottle):
+    scope = 'register'
+
+
+class RegisterAccountRateThrottle(AccountRateThrottle):
+    scope = 'register_account'
+
+
+class RefreshRateThrottle(IPRateThrottle):
+    scope = 'refresh'
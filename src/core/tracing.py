@@ -0,0 +1,125 @@
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+
+
+class DecisionTracer:
+    """
+    Трассировка решений `HasPermission` (включается через `AUTHZ_TRACING`).
+
+    Выборка решений (`SAMPLE_RATE`) складывается в кольцевой буфер, а все
+    решения дольше `SLOW_THRESHOLD_MS` — в отдельный буфер медленных проверок.
+    Медленная проверка повторяется под cProfile в обход кэша (не чаще раза в
+    `PROFILE_INTERVAL` секунд на процесс), чтобы в проде увидеть горячий путь
+    без подключения профилировщика. Буферы — на процесс, не агрегируются.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_profile = 0.0
+        self.clear()
+
+    def clear(self, tenant_id=None):
+        """
+        Очищает буферы; с `tenant_id` — только трассы этого арендатора.
+        """
+        config = settings.AUTHZ_TRACING
+        with self._lock:
+            if tenant_id is None:
+                self.decisions = deque(maxlen=config['BUFFER_SIZE'])
+                self.slow = deque(maxlen=config['SLOW_BUFFER_SIZE'])
+                return
+            self.decisions = deque(
+                (record for record in self.decisions if record['tenant_id'] != tenant_id), maxlen=config['BUFFER_SIZE'],
+            )
+            self.slow = deque(
+                (record for record in self.slow if record['tenant_id'] != tenant_id), maxlen=config['SLOW_BUFFER_SIZE'],
+            )
+
+    def trace(self, request, view, required_permission, check):
+        """
+        Выполняет `check(request, required_permission, use_cache=True)`,
+        замеряя время и SQL-запросы, и при необходимости записывает трассу.
+        Возвращает результат проверки без изменений.
+        """
+        config = settings.AUTHZ_TRACING
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            granted, details = check(request, required_permission, use_cache=True)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        slow = elapsed_ms >= config['SLOW_THRESHOLD_MS']
+        if not slow and random.random() >= config['SAMPLE_RATE']:
+            return granted, details
+
+        user = request.user
+        authenticated = bool(user and user.is_authenticated)
+        record = {
+            'timestamp': time.time(),
+            # Трассы видны только суперпользователям того же арендатора
+            'tenant_id': user.tenant_id if authenticated else None,
+            'user_id': user.pk if authenticated else None,
+            'user': str(user) if user else None,
+            'view': type(view).__name__,
+            'required_permission': required_permission,
+            'granted': granted,
+            'reason': details.get('reason'),
+            'roles': details.get('roles', []),
+            'cache': details.get('cache'),
+            'queries': queries[0],
+            'elapsed_ms': round(elapsed_ms, 3),
+        }
+        if slow:
+            record['profile'] = self._profile(request, required_permission, check)
+        with self._lock:
+            self.decisions.append(record)
+            if slow:
+                self.slow.append(record)
+        return granted, details
+
+    def _profile(self, request, required_permission, check):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_profile < settings.AUTHZ_TRACING['PROFILE_INTERVAL']:
+                return None
+            self._last_profile = now
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Уже работает другой профилировщик (например, в отладчике)
+            return None
+        try:
+            check(request, required_permission, use_cache=False)
+        finally:
+            profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(25)
+        return output.getvalue()
+
+    def snapshot(self, slow_only=False, tenant_id=None):
+        """
+        Копия буфера; с `tenant_id` — только трассы пользователей этого арендатора.
+        """
+        with self._lock:
+            records = list(self.slow if slow_only else self.decisions)
+        if tenant_id is None:
+            return records
+        return [record for record in records if record['tenant_id'] == tenant_id]
+
+
+tracer = DecisionTracer()
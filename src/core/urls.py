@@ -1,14 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
 from .views import (
     RegisterView,
+    LoginView,
+    RefreshView,
     LogoutView,
     ProfileView,
     SecretDocumentView,
+    TokenIntrospectionView,
+    AuthzTraceView,
     RoleViewSet,
     PermissionViewSet,
     ResourceViewSet,
@@ -23,10 +23,12 @@ router.register(r'actions', ActionViewSet)
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='auth_register'),
-    path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('login/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('login/', LoginView.as_view(), name='token_obtain_pair'),
+    path('login/refresh/', RefreshView.as_view(), name='token_refresh'),
     path('logout/', LogoutView.as_view(), name='auth_logout'),
     path('profile/', ProfileView.as_view(), name='auth_profile'),
     path('secret/', SecretDocumentView.as_view(), name='secret_document'),
+    path('introspect/', TokenIntrospectionView.as_view(), name='token_introspect'),
+    path('admin/authz-traces/', AuthzTraceView.as_view(), name='authz_traces'),
     path('admin/', include(router.urls)),
 ]
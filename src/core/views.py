@@ -1,13 +1,36 @@
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views import View
 from rest_framework import generics, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
-from .models import CustomUser, Role, Permission, Resource, Action
+from .models import AuditEvent, CustomUser, Role, Permission, Resource, Action
 from .serializers import (
     RegisterSerializer, UserSerializer, RoleSerializer,
-    PermissionSerializer, ResourceSerializer, ActionSerializer
+    PermissionSerializer, PermissionUserSerializer, ResourceSerializer, ActionSerializer,
+    TokenIntrospectionSerializer
+)
+from .permissions import IsSuperUser, HasPermission, HasMetricsToken
+from . import audit, metrics
+from .tracing import tracer
+from .caching import CachedCatalogListMixin, ConditionalRetrieveMixin, role_etag, user_etag
+from .health import readiness
+from .introspection import introspect_tokens, revoke_user_tokens
+from .pagination import IdCursorPagination
+from .schema import get_schema_document
+from .tenancy import TenantScopedViewSetMixin, request_tenant_id
+from .throttling import (
+    LoginRateThrottle, LoginAccountRateThrottle, RegisterRateThrottle,
+    RegisterAccountRateThrottle, RefreshRateThrottle
 )
-from .permissions import IsSuperUser, HasPermission
 
 
 class RegisterView(generics.CreateAPIView):
@@ -18,6 +41,49 @@ class RegisterView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
     permission_classes = (permissions.AllowAny,)
     serializer_class = RegisterSerializer
+    throttle_classes = (RegisterRateThrottle, RegisterAccountRateThrottle)
+
+
+class LoginView(TokenObtainPairView):
+    """
+    Представление для входа (получение пары токенов).
+    Ограничено по IP и по аккаунту: лишние попытки отклоняются с 429
+    до проверки пароля.
+    """
+    throttle_classes = (LoginRateThrottle, LoginAccountRateThrottle)
+
+    def get_serializer(self, *args, **kwargs):
+        # Сохраняем сериализатор: после проверки в нем пользователь для журнала аудита
+        self.token_serializer = super().get_serializer(*args, **kwargs)
+        return self.token_serializer
+
+    def post(self, request, *args, **kwargs):
+        try:
+            response = super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            email = request.data.get('email') if isinstance(request.data, dict) else None
+            audit.record(AuditEvent.LOGIN_FAILED, request, email=email if isinstance(email, str) else None)
+            raise
+        if response.status_code == status.HTTP_200_OK:
+            metrics.inc('auth_tokens_issued_total', grant='password')
+            audit.record(AuditEvent.LOGIN, request, user_id=self.token_serializer.user.pk)
+        return response
+
+
+class RefreshView(TokenRefreshView):
+    """
+    Представление для обновления access-токена с ограничением по IP.
+    """
+    throttle_classes = (RefreshRateThrottle,)
+
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            metrics.inc('auth_tokens_issued_total', grant='refresh')
+            # Только что выпущенный токен не проверяем повторно, лишь читаем claim
+            user_id = AccessToken(response.data['access'], verify=False).get(jwt_settings.USER_ID_CLAIM)
+            audit.record(AuditEvent.REFRESH, request, user_id=user_id)
+        return response
 
 
 class LogoutView(generics.GenericAPIView):
@@ -32,23 +98,29 @@ class LogoutView(generics.GenericAPIView):
             refresh_token = request.data["refresh"]
             token = RefreshToken(refresh_token)
             token.blacklist()
+            audit.record(AuditEvent.LOGOUT, request, jti=token.get(jwt_settings.JTI_CLAIM))
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
-class ProfileView(generics.RetrieveUpdateDestroyAPIView):
+class ProfileView(ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Представление для просмотра и обновления профиля пользователя.
     Доступно только для аутентифицированных пользователей.
+    GET поддерживает `If-None-Match` (ETag по версии профиля и ролей).
     """
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    etag_prefetch = ('roles',)
 
     def get_object(self):
         return self.request.user
 
+    def get_etag(self, instance):
+        return user_etag(instance)
+
     def perform_destroy(self, instance):
         """
         При "удалении" пользователя, он деактивируется (soft delete)
@@ -57,11 +129,16 @@ class ProfileView(generics.RetrieveUpdateDestroyAPIView):
         instance.is_active = False
         instance.save()
 
+        # Access-токены в черный список не попадают, отзываем их "водяным знаком"
+        revoke_user_tokens(instance)
+
         # Добавляем все активные токены пользователя в черный список
         tokens = OutstandingToken.objects.filter(user=instance)
         for token in tokens:
             BlacklistedToken.objects.get_or_create(token=token)
 
+        audit.record(AuditEvent.ACCOUNT_DEACTIVATED, self.request)
+
 
 class SecretDocumentView(generics.GenericAPIView):
     """
@@ -74,42 +151,210 @@ class SecretDocumentView(generics.GenericAPIView):
         return Response({"secret": "This is a secret document!"})
 
 
+class TokenIntrospectionView(generics.GenericAPIView):
+    """
+    Интроспекция токенов для API-шлюза (RFC 7662).
+    Возвращает статус токена, пользователя, его роли и эффективные разрешения.
+    Пакетная форма: `{"tokens": [...]}` -> `{"results": [...]}`.
+    """
+    serializer_class = TokenIntrospectionSerializer
+    permission_classes = (HasPermission,)
+    required_permission = 'introspect Token'
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if 'tokens' in serializer.validated_data:
+            return Response({'results': introspect_tokens(serializer.validated_data['tokens'])})
+        return Response(introspect_tokens([serializer.validated_data['token']])[0])
+
+
+class MetricsView(APIView):
+    """
+    Метрики сервиса в текстовом формате Prometheus.
+    """
+    authentication_classes = ()
+    permission_classes = (HasMetricsToken,)
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(
+            metrics.render(metrics.collect()),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+
+class HealthView(View):
+    """
+    Проба живости (`/healthz`): процесс запущен и обрабатывает запросы.
+    Внешние зависимости не проверяет, чтобы сбой БД не приводил к
+    перезапуску всех реплик.
+    """
+
+    def get(self, request, *args, **kwargs):
+        response = JsonResponse({'status': 'ok'})
+        patch_cache_control(response, no_store=True)
+        return response
+
+
+class ReadinessView(View):
+    """
+    Проба готовности (`/readyz`): БД отвечает на `SELECT 1` и все миграции
+    применены. Результат кэшируется в процессе (`HEALTH_CHECKS['CACHE_TTL']`);
+    при неготовности — 503, чтобы балансировщик не направлял сюда трафик.
+    """
+
+    def get(self, request, *args, **kwargs):
+        result = readiness.get()
+        response = JsonResponse(result, status=200 if result['status'] == 'ok' else 503)
+        patch_cache_control(response, no_store=True)
+        return response
+
+
+class OpenAPISchemaView(View):
+    """
+    Отдает схему OpenAPI из памяти процесса (см. `core.schema`).
+    Клиенты и прокси кэшируют ответ на `OPENAPI_SCHEMA_MAX_AGE` секунд,
+    а затем перепроверяют его по ETag и получают 304 без тела.
+    """
+
+    def get(self, request, *args, **kwargs):
+        body, etag = get_schema_document()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+        return response
+
+
+class ApiDocsView(View):
+    """
+    Страница Swagger UI или ReDoc поверх схемы из `OpenAPISchemaView`.
+    Ассеты берутся с CDN, так что staticfiles и шаблоны не нужны.
+    """
+    ui = 'swagger'
+    pages = {
+        'swagger': (
+            '<!DOCTYPE html><html><head><title>Auth Service API</title>'
+            '<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/swagger-ui-dist@5/swagger-ui.css">'
+            '</head><body><div id="swagger-ui"></div>'
+            '<script src="https://cdn.jsdelivr.net/npm/swagger-ui-dist@5/swagger-ui-bundle.js"></script>'
+            '<script>SwaggerUIBundle({{url: "{schema_url}", dom_id: "#swagger-ui"}});</script>'
+            '</body></html>'
+        ),
+        'redoc': (
+            '<!DOCTYPE html><html><head><title>Auth Service API</title></head><body>'
+            '<redoc spec-url="{schema_url}"></redoc>'
+            '<script src="https://cdn.jsdelivr.net/npm/redoc@2/bundles/redoc.standalone.js"></script>'
+            '</body></html>'
+        ),
+    }
+
+    def get(self, request, *args, **kwargs):
+        response = HttpResponse(self.pages[self.ui].format(schema_url=reverse('schema-json')))
+        patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+        return response
+
+
 # Admin Views
-class RoleViewSet(viewsets.ModelViewSet):
+class AuthzTraceView(generics.GenericAPIView):
+    """
+    Просмотр трасс решений HasPermission текущего процесса.
+    `?slow=1` — только медленные проверки (с профилем cProfile).
+    DELETE очищает буферы. Доступно только для суперпользователей,
+    в пределах их арендатора (решения анонимных запросов не показываются).
+    """
+    permission_classes = (IsSuperUser,)
+
+    def get(self, request, *args, **kwargs):
+        slow_only = request.query_params.get('slow') in ('1', 'true')
+        return Response({
+            'enabled': settings.AUTHZ_TRACING['ENABLED'],
+            'decisions': tracer.snapshot(slow_only=slow_only, tenant_id=request_tenant_id(request)),
+        })
+
+    def delete(self, request, *args, **kwargs):
+        tracer.clear(tenant_id=request_tenant_id(request))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RoleViewSet(TenantScopedViewSetMixin, CachedCatalogListMixin, ConditionalRetrieveMixin, viewsets.ModelViewSet):
     """
     ViewSet для управления ролями.
-    Доступно только для суперпользователей.
+    Доступно только для суперпользователей, в пределах их арендатора.
     """
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
     permission_classes = (IsSuperUser,)
+    catalog_name = 'roles'
+    etag_prefetch = ('permissions',)
 
+    def get_etag(self, instance):
+        return role_etag(instance)
 
-class PermissionViewSet(viewsets.ReadOnlyModelViewSet):
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.audit_role_change('create', serializer.data)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.audit_role_change('update', serializer.data)
+
+    def perform_destroy(self, instance):
+        role = {'id': instance.pk, 'name': instance.name}
+        super().perform_destroy(instance)
+        self.audit_role_change('delete', role)
+
+    def audit_role_change(self, operation, role):
+        # serializer.data все равно строится для ответа (и кэшируется), лишних запросов нет
+        audit.record(
+            AuditEvent.ROLE_CHANGED, self.request,
+            operation=operation, role_id=role['id'], role=role['name'], permissions=role.get('permissions'),
+        )
+
+
+class PermissionViewSet(TenantScopedViewSetMixin, CachedCatalogListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet для просмотра разрешений.
-    Доступно только для суперпользователей.
+    Доступно только для суперпользователей, в пределах их арендатора.
     """
-    queryset = Permission.objects.all()
+    queryset = Permission.objects.select_related('resource', 'action')
     serializer_class = PermissionSerializer
     permission_classes = (IsSuperUser,)
+    catalog_name = 'permissions'
+
+    @action(detail=True, serializer_class=PermissionUserSerializer, pagination_class=IdCursorPagination)
+    def users(self, request, pk=None):
+        """
+        Обратный поиск: пользователи, получающие разрешение хотя бы через одну
+        роль. Читается из `UserEffectivePermission` по индексу (permission, user),
+        постранично (`?cursor=...&page_size=...`).
+        """
+        permission = self.get_object()
+        users = CustomUser.objects.filter(
+            tenant_id=permission.tenant_id, effective_permissions__permission=permission,
+        ).only('id', 'email', 'is_active')
+        page = self.paginate_queryset(users)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
 
 
-class ResourceViewSet(viewsets.ModelViewSet):
+class ResourceViewSet(TenantScopedViewSetMixin, CachedCatalogListMixin, viewsets.ModelViewSet):
     """
     ViewSet для управления ресурсами.
-    Доступно только для суперпользователей.
+    Доступно только для суперпользователей, в пределах их арендатора.
     """
     queryset = Resource.objects.all()
     serializer_class = ResourceSerializer
     permission_classes = (IsSuperUser,)
+    catalog_name = 'resources'
 
 
-class ActionViewSet(viewsets.ModelViewSet):
+class ActionViewSet(TenantScopedViewSetMixin, CachedCatalogListMixin, viewsets.ModelViewSet):
     """
     ViewSet для управления действиями.
-    Доступно только для суперпользователей.
+    Доступно только для суперпользователей, в пределах их арендатора.
     """
     queryset = Action.objects.all()
     serializer_class = ActionSerializer
     permission_classes = (IsSuperUser,)
+    catalog_name = 'actions'